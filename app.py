@@ -1,12 +1,92 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import zipfile
 import json
-from datetime import timedelta, datetime
+from datetime import date, timedelta, datetime
 import os
+import hashlib
+import sqlite3
+import shutil
+import tempfile
+import time
+import heapq
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import namedtuple
+from functools import partial
 import plotly.express as px
 import plotly.graph_objects as go
 
+try:
+    # Optional faster decoder; falls back to the standard library when not installed
+    import orjson
+    json_loads = orjson.loads
+    JSON_BACKEND = 'orjson'
+except ImportError:
+    json_loads = json.loads
+    JSON_BACKEND = 'json'
+
+INGEST_WORKERS = min(8, os.cpu_count() or 1)
+CACHE_DIR = '.spotify_cache'
+DEFAULT_EXPORT = 'Spotify Extended Streaming History.zip'
+SQLITE_CHUNK_ROWS = 50000
+# Shared memory-mapped datasets: one directory per version plus a CURRENT pointer file
+DATASET_DIR = os.path.join(CACHE_DIR, 'datasets')
+EPOCH_DATE = date(1970, 1, 1)
+
+# Fixation metric: plays of at least real_ms count as real plays; a window's
+# fixation is its real plays plus the share of plays started by selection_reason,
+# and windows with fewer than min_real_plays real plays do not count
+FixationParams = namedtuple('FixationParams', ['real_ms', 'window_days', 'selection_reason', 'min_real_plays'])
+DEFAULT_FIXATION = FixationParams(real_ms=25000, window_days=30, selection_reason='clickrow', min_real_plays=2)
+# Combinations evaluated together by fixation_sweep whenever one of them is requested
+SWEEP_REAL_MS = (15000, 20000, 25000, 30000)
+SWEEP_WINDOW_DAYS = (7, 14, 30, 90)
+# Song-days expanded at once when building a daily fixation timeline
+TIMELINE_CHUNK_SONG_DAYS = 100000
+UNKNOWN_ALBUM = '(unknown album)'
+# Sessions: idle time that ends a session, the positions counted as the start of
+# a session, and the position buckets for skip rates
+SESSION_GAP_MINUTES = 30
+SESSION_EARLY_POSITIONS = 3
+SESSION_POSITION_BUCKETS = [1, 2, 3, 4, 6, 11, 21]
+SESSION_POSITION_LABELS = ['1', '2', '3', '4-5', '6-10', '11-20', '21+']
+# Co-listening: partners kept per song, and song pairs expanded per chunk
+CO_LISTEN_TOP_K = 50
+CO_LISTEN_CHUNK_PAIRS = 2000000
+# Charts: most points sent per trace, and time buckets as (title label, axis name, approximate days)
+CHART_MAX_POINTS = 1500
+CHART_BUCKETS = {
+    'D': ('Daily', 'day', 1),
+    'W': ('Weekly', 'week', 7),
+    'M': ('Monthly', 'month', 30.44),
+    'Y': ('Yearly', 'year', 365.25),
+}
+# Song list exports: format -> (file extension, MIME type), and songs encoded per chunk
+EXPORT_FORMATS = {
+    'Text': ('txt', 'text/plain'),
+    'CSV': ('csv', 'text/csv'),
+    'M3U': ('m3u', 'audio/x-mpegurl'),
+    'JSON': ('json', 'application/json'),
+}
+EXPORT_CHUNK_ROWS = 5000
+PEAK_COLUMNS = ['peak_fixation', 'peak_day', 'real_plays', 'selections', 'skips', 'total_plays']
+SONG_KEY_SEPARATOR = '\x1f'
+MS_PER_DAY = 24 * 60 * 60 * 1000
+# Compact plays layout: bit per boolean export field, and the column types of the plays table
+PLAY_FLAGS = {'shuffle': 1, 'skipped': 2, 'offline': 4, 'incognito_mode': 8}
+PLAY_DTYPES = {
+    'song_key': 'int32',
+    'day': 'int32',
+    'ts': 'int64',
+    'ms_played': 'uint32',
+    'reason_start': 'category',
+    'reason_end': 'category',
+    'flags': 'uint8',
+}
+# Synthetic export sizes (copies of the bundled export) the footprint benchmark measures
+FOOTPRINT_COPIES = (1, 10, 30)
+
 st.set_page_config(page_title="Spotify Analytics", layout="wide", initial_sidebar_state="collapsed")
 
 # Custom CSS for the specified styling
@@ -117,21 +197,93 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def _read_upload(uploaded_file):
+    """Return a reader for the raw bytes of a local path or an uploaded file"""
+    if isinstance(uploaded_file, str):
+        def read():
+            with open(uploaded_file, 'rb') as f:
+                return f.read()
+        return read
+    return uploaded_file.getvalue
+
+def _decode_history_member(member_name, read):
+    """Read and decode one streaming history JSON document, timing each stage"""
+    started = time.perf_counter()
+    raw = read()
+    read_done = time.perf_counter()
+    records = json_loads(raw)
+    decode_done = time.perf_counter()
+    frame = pd.DataFrame(records)
+    frame_done = time.perf_counter()
+    timing = {
+        'Member': member_name,
+        'Records': len(records),
+        'MB': round(len(raw) / 1e6, 2),
+        'Read (s)': round(read_done - started, 3),
+        'Decode (s)': round(decode_done - read_done, 3),
+        'Frame (s)': round(frame_done - decode_done, 3),
+    }
+    return frame, timing
+
+def load_history_files(uploaded_files, on_member=None):
+    """Decode all JSON members of the given ZIP/JSON files in a worker pool and merge them by timestamp
+
+    on_member, if given, is called from the calling thread with each decoded
+    member frame as soon as it is ready, in completion order.
+    """
+    jobs = []
+    archives = []
+    try:
+        for uploaded_file in uploaded_files:
+            file_name = uploaded_file if isinstance(uploaded_file, str) else uploaded_file.name
+            if file_name.endswith('.zip'):
+                # Hand zipfile an open handle so the workers share it through zipfile's own lock
+                owned_handle = open(uploaded_file, 'rb') if isinstance(uploaded_file, str) else None
+                zip_ref = zipfile.ZipFile(owned_handle or uploaded_file, 'r')
+                archives.append((zip_ref, owned_handle))
+                for member_name in zip_ref.namelist():
+                    if member_name.endswith('.json'):
+                        jobs.append((member_name, partial(zip_ref.read, member_name)))
+            else:
+                jobs.append((file_name, _read_upload(uploaded_file)))
+
+        if not jobs:
+            return None, []
+
+        # Raw reads are serialised by zipfile's lock. Only zlib inflation releases
+        # the GIL and runs in parallel; JSON decoding and frame construction hold
+        # it, so they run one member at a time while other members inflate
+        results = [None] * len(jobs)
+        with ThreadPoolExecutor(max_workers=min(INGEST_WORKERS, len(jobs))) as pool:
+            futures = {pool.submit(_decode_history_member, *job): position for position, job in enumerate(jobs)}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                if on_member is not None:
+                    on_member(results[futures[future]][0])
+    finally:
+        for zip_ref, owned_handle in archives:
+            zip_ref.close()
+            if owned_handle is not None:
+                owned_handle.close()
+
+    frames = [frame for frame, _ in results if len(frame) > 0]
+    timings = [timing for _, timing in results]
+    if not frames:
+        return None, timings
+
+    data = pd.concat(frames, ignore_index=True)
+    if 'ts' in data.columns:
+        data = data.sort_values('ts', kind='stable').reset_index(drop=True)
+    return data, timings
+
 def load_default_data():
     """Load default data from local files"""
     try:
-        if os.path.exists('Spotify Extended Streaming History.zip'):
-            with zipfile.ZipFile('Spotify Extended Streaming History.zip', 'r') as zip_ref:
-                all_data = []
-                for file_name in zip_ref.namelist():
-                    if file_name.endswith('.json'):
-                        with zip_ref.open(file_name) as json_file:
-                            data = json.load(json_file)
-                            all_data.extend(data)
-                return pd.DataFrame(all_data) if all_data else None
+        if os.path.exists(DEFAULT_EXPORT):
+            return load_history_files([DEFAULT_EXPORT])
     except Exception as e:
         st.error(f"Error loading default data: {str(e)}")
-    return None
+    return None, []
 
 def load_default_playlists():
     """Load default playlist data from local file"""
@@ -147,21 +299,8 @@ def load_default_playlists():
         st.error(f"Error loading default playlists: {str(e)}")
     return None
 
-def process_spotify_data(uploaded_files):
-    all_data = []
-    for uploaded_file in uploaded_files:
-        if uploaded_file.name.endswith('.zip'):
-            with zipfile.ZipFile(uploaded_file, 'r') as zip_ref:
-                for file_name in zip_ref.namelist():
-                    if file_name.endswith('.json'):
-                        with zip_ref.open(file_name) as json_file:
-                            data = json.load(json_file)
-                            all_data.extend(data)
-        else:
-            data = json.load(uploaded_file)
-            all_data.extend(data)
-    
-    return pd.DataFrame(all_data) if all_data else None
+def process_spotify_data(uploaded_files, on_member=None):
+    return load_history_files(uploaded_files, on_member)
 
 def process_playlist_data(uploaded_file):
     try:
@@ -171,49 +310,801 @@ def process_playlist_data(uploaded_file):
         st.error(f"Error loading playlist file: {str(e)}")
         return None
 
-def calculate_peak_fixation(song_df):
-    """Calculate peak fixation using rolling 30-day windows - the core analysis feature"""
-    song_df = song_df.sort_values('date')
-    dates = song_df['date'].unique()
+def _window_bounds(song, day, window_days):
+    """Start/end offsets of every rolling window in plays sorted by (song, day)
+
+    Each window ends on the last play of a (song, day) pair and covers the
+    window_days preceding days inclusive; returns (ends, starts per window
+    length) as indexes into the sorted plays.
+    """
+    # One sortable key per play; the stride keeps windows from reaching into the previous song
+    offset = day - day.min() + max(window_days) + 1
+    key = song * (offset.max() + 1) + offset
+    ends = np.flatnonzero(np.r_[key[1:] != key[:-1], True]) + 1
+    end_keys = key[ends - 1]
+    starts = {window: np.searchsorted(key, end_keys - window, side='left') for window in window_days}
+    return ends, starts
+
+def fixation_sweep(batches, params_list):
+    """Peak fixation per song for many parameter combinations in a single vectorized pass
+
+    batches are plays ordered by (song_key, day) that never split a song. Window
+    bounds are computed once per window length and real/selected play counts once
+    per threshold/reason, so each extra combination costs a few array operations.
+    Returns {params: DataFrame(song_key, peak_fixation, peak_day, real_plays,
+    selections, skips, total_plays)}; songs without a qualifying window get 0.
+    """
+    params_list = list(dict.fromkeys(params_list))
+    parts = {params: [] for params in params_list}
+    for batch in batches:
+        if len(batch) == 0:
+            continue
+        peaks = _sweep_arrays(batch['song_key'].to_numpy(dtype=np.int64), batch['day'].to_numpy(dtype=np.int64),
+                              batch['ms_played'].to_numpy(), batch['reason_start'].to_numpy(dtype=object), params_list)
+        for params, frame in peaks.items():
+            parts[params].append(frame.rename(columns={'key': 'song_key'}))
+
+    columns = ['song_key'] + PEAK_COLUMNS
+    return {params: pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+            for params, frames in parts.items()}
+
+def _sweep_arrays(key, day, ms_played, reason_start, params_list):
+    """Peak window per group key for plays sorted by (key, day); the core of fixation_sweep"""
+    ends, starts = _window_bounds(key, day, sorted({params.window_days for params in params_list}))
+    end_key = key[ends - 1]
+    end_day = day[ends - 1]
+    key_starts = np.flatnonzero(np.r_[True, end_key[1:] != end_key[:-1]])
+    real_cumsum = {real_ms: np.r_[0, np.cumsum(ms_played >= real_ms)]
+                   for real_ms in {params.real_ms for params in params_list}}
+    selected_cumsum = {reason: np.r_[0, np.cumsum(reason_start == reason)]
+                       for reason in {params.selection_reason for params in params_list}}
+
+    peaks = {}
+    for params in params_list:
+        window_starts = starts[params.window_days]
+        total = ends - window_starts
+        real = real_cumsum[params.real_ms][ends] - real_cumsum[params.real_ms][window_starts]
+        selected = selected_cumsum[params.selection_reason][ends] - selected_cumsum[params.selection_reason][window_starts]
+        fixation = np.where(real >= params.min_real_plays, real + selected / total, 0.0)
+
+        # Earliest window reaching each key's maximum; later windows must beat it strictly
+        peak = np.maximum.reduceat(fixation, key_starts)
+        is_peak = (fixation == np.repeat(peak, np.diff(np.r_[key_starts, len(ends)]))) & (fixation > 0)
+        first_peak = np.minimum.reduceat(np.where(is_peak, np.arange(len(ends)), len(ends)), key_starts)
+        found = first_peak < len(ends)
+        best = np.where(found, first_peak, 0)
+        peaks[params] = pd.DataFrame({
+            'key': end_key[key_starts],
+            'peak_fixation': peak,
+            'peak_day': np.where(found, end_day[best], -1),
+            'real_plays': np.where(found, real[best], 0),
+            'selections': np.where(found, selected[best], 0),
+            'skips': np.where(found, total[best] - real[best], 0),
+            'total_plays': np.where(found, total[best], 0),
+        })
+    return peaks
+
+def peak_fixations(store, params=DEFAULT_FIXATION, since=None):
+    """Cached per-song peak fixations for one parameter combination
+
+    On a cache miss the whole SWEEP_REAL_MS x SWEEP_WINDOW_DAYS grid around
+    params is evaluated in the same pass, so later slider moves are lookups.
+    Only plays on or after `since` count when it is given.
+    """
+    since_day = date_to_day(since) if since is not None else None
+    if (params, since_day) not in store.fixation_cache:
+        grid = [params] + [params._replace(real_ms=real_ms, window_days=window_days)
+                           for real_ms in SWEEP_REAL_MS for window_days in SWEEP_WINDOW_DAYS]
+        for combination, result in fixation_sweep(store.iter_play_batches(since), grid).items():
+            result['peak_date'] = [day_to_date(day) if day >= 0 else None for day in result['peak_day']]
+            store.fixation_cache[(combination, since_day)] = result
+    return store.fixation_cache[(params, since_day)]
+
+def _hierarchy_keys(songs):
+    """Album and artist keys indexed by song_key, plus the album and artist tables
+
+    Songs are numbered in (artist, track) order, so each artist's songs are contiguous.
+    """
+    songs = songs.assign(album=songs['album'].fillna(UNKNOWN_ALBUM))
+    album_key = songs.groupby(['artist', 'album'], sort=True).ngroup().to_numpy()
+    artist_key = songs.groupby('artist', sort=True).ngroup().to_numpy()
+    albums = songs.assign(album_key=album_key, artist_key=artist_key).groupby('album_key').agg(
+        artist_key=('artist_key', 'first'),
+        artist=('artist', 'first'),
+        album=('album', 'first'),
+        tracks=('song_key', 'size')
+    )
+    artists = songs.assign(album_key=album_key, artist_key=artist_key).groupby('artist_key').agg(
+        artist=('artist', 'first'),
+        albums=('album_key', 'nunique'),
+        tracks=('song_key', 'size')
+    )
+    tracks = songs.assign(album_key=album_key, artist_key=artist_key).set_index('song_key')
+    return album_key, artist_key, tracks, albums, artists
+
+def _level_rollup(codes, day, ms_played, reason_start, params, presorted=False):
+    """Play counts, first/last day and peak fixation per group code"""
+    order = np.arange(len(codes)) if presorted else np.lexsort((day, codes))
+    peak = _sweep_arrays(codes[order], day[order], ms_played[order], reason_start[order], [params])[params]
+    stats = pd.DataFrame({
+        'key': codes,
+        'real': ms_played >= params.real_ms,
+        'selected': reason_start == params.selection_reason,
+        'day': day,
+    }).groupby('key').agg(
+        total_plays=('real', 'size'),
+        real_plays=('real', 'sum'),
+        selections=('selected', 'sum'),
+        first_day=('day', 'min'),
+        last_day=('day', 'max')
+    )
+    return stats.join(peak.set_index('key')[['peak_fixation', 'peak_day']])
+
+def hierarchy_rollups(store, params=DEFAULT_FIXATION):
+    """Track, album and artist rollups computed together from one pass over the sorted history
+
+    Batches hold whole artists, so the album and artist windows only need a
+    re-sort inside each batch. Cached on the store per parameter combination;
+    returns {'track': ..., 'album': ..., 'artist': ...} frames indexed by key.
+    """
+    if params not in store.rollup_cache:
+        album_key, artist_key, tracks, albums, artists = _hierarchy_keys(store.songs_table())
+        parts = {'track': [], 'album': [], 'artist': []}
+        for batch in store.iter_play_batches(group_of=artist_key):
+            if len(batch) == 0:
+                continue
+            song = batch['song_key'].to_numpy(dtype=np.int64)
+            day = batch['day'].to_numpy(dtype=np.int64)
+            ms_played = batch['ms_played'].to_numpy()
+            reason_start = batch['reason_start'].to_numpy(dtype=object)
+            parts['track'].append(_level_rollup(song, day, ms_played, reason_start, params, presorted=True))
+            parts['album'].append(_level_rollup(album_key[song], day, ms_played, reason_start, params))
+            parts['artist'].append(_level_rollup(artist_key[song], day, ms_played, reason_start, params))
+
+        rollups = {}
+        for level, names in (('track', tracks), ('album', albums), ('artist', artists)):
+            rollup = names.join(pd.concat(parts[level]), how='inner')
+            rollup['skips'] = rollup['total_plays'] - rollup['real_plays']
+            rollup['first_played'] = pd.to_datetime(rollup['first_day'], unit='D').dt.date
+            rollup['last_played'] = pd.to_datetime(rollup['last_day'], unit='D').dt.date
+            rollup['peak_date'] = [day_to_date(day) if day >= 0 else None for day in rollup['peak_day']]
+            rollups[level] = rollup
+        store.rollup_cache[params] = rollups
+    return store.rollup_cache[params]
+
+def top_artist_rollup(store, n=10, params=DEFAULT_FIXATION):
+    """Top artists by real plays, with their artist-level peak fixation"""
+    artists = hierarchy_rollups(store, params)['artist']
+    top = artists.sort_values('real_plays', ascending=False, kind='stable').head(n)
+    top = top[['artist', 'real_plays', 'peak_fixation']].round({'peak_fixation': 2})
+    top.columns = ['Artist', 'Real Plays', 'Peak Fixation']
+    return top
+
+def sessionize(ts, ms_played, gap_ms):
+    """Session number and 0-based position in session for plays sorted by ts, in O(n)
+
+    Spotify's ts marks when a play stopped, so each play started ms_played
+    earlier; a new session begins when the idle time before a play exceeds gap_ms.
+    Returns (session, position, index of each session's first play).
+    """
+    started = ts - ms_played
+    new_session = np.r_[True, started[1:] - ts[:-1] > gap_ms]
+    session = np.cumsum(new_session) - 1
+    session_starts = np.flatnonzero(new_session)
+    position = np.arange(len(ts)) - session_starts[session]
+    return session, position, session_starts
+
+def _rate(numerator, denominator):
+    return np.divide(numerator, denominator, out=np.zeros(len(numerator)), where=denominator > 0)
+
+def session_analytics(store, gap_minutes=SESSION_GAP_MINUTES, real_ms=DEFAULT_FIXATION.real_ms):
+    """Session, binge-run, per-song and per-position statistics, cached on the store
+
+    Everything is derived from the chronological int64 timestamp array with
+    array operations only, so cost grows linearly with the number of plays.
+    """
+    cache_key = (gap_minutes, real_ms)
+    if cache_key not in store.session_cache:
+        plays = store.chronological_plays()
+        song = plays['song_key'].to_numpy(dtype=np.int64)
+        ts = plays['ts'].to_numpy(dtype=np.int64)
+        ms_played = plays['ms_played'].to_numpy(dtype=np.int64)
+        real = ms_played >= real_ms
+        completed = plays['completed'].to_numpy()
+        total = len(song)
+
+        session, position, session_starts = sessionize(ts, ms_played, gap_minutes * 60 * 1000)
+        session_sizes = np.diff(np.r_[session_starts, total])
+        is_last = np.r_[session[1:] != session[:-1], True]
+
+        # Binge runs: consecutive plays of one song inside a session
+        run_starts = np.flatnonzero(np.r_[True, (song[1:] != song[:-1]) | (session[1:] != session[:-1])])
+        run_lengths = np.diff(np.r_[run_starts, total])
+        first_run = np.searchsorted(run_starts, session_starts)
+
+        sessions = pd.DataFrame({
+            'start': pd.to_datetime(ts[session_starts] - ms_played[session_starts], unit='ms', utc=True),
+            'end': pd.to_datetime(ts[session_starts + session_sizes - 1], unit='ms', utc=True),
+            'plays': session_sizes,
+            'real_plays': np.add.reduceat(real.astype(np.int64), session_starts),
+            'minutes': np.add.reduceat(ms_played, session_starts) / 60000,
+            'longest_run': np.maximum.reduceat(run_lengths, first_run),
+            'first_song': song[session_starts],
+            'last_song': song[session_starts + session_sizes - 1],
+        })
+        sessions['skips'] = sessions['plays'] - sessions['real_plays']
+
+        runs = pd.DataFrame({
+            'song_key': song[run_starts],
+            'plays': run_lengths,
+            'start': pd.to_datetime(ts[run_starts] - ms_played[run_starts], unit='ms', utc=True),
+        })
+        runs = runs[runs['plays'] >= 3].sort_values('plays', ascending=False, kind='stable')
+
+        n_songs = int(song.max()) + 1 if total else 0
+        def per_song(mask=None):
+            return np.bincount(song, weights=None if mask is None else mask.astype(np.float64), minlength=n_songs)
+        early = position < SESSION_EARLY_POSITIONS
+        song_plays = per_song()
+        early_plays = per_song(early)
+        songs = pd.DataFrame({
+            'song_key': np.arange(n_songs),
+            'plays': song_plays.astype(np.int64),
+            'session_starts': per_song(position == 0).astype(np.int64),
+            'session_ends': per_song(is_last).astype(np.int64),
+            'completion_rate': _rate(per_song(completed), song_plays),
+            'skip_rate': _rate(per_song(~real), song_plays),
+            'early_skip_rate': _rate(per_song(~real & early), early_plays),
+            'late_skip_rate': _rate(per_song(~real & ~early), song_plays - early_plays),
+            'mean_position': _rate(np.bincount(song, weights=position + 1, minlength=n_songs), song_plays),
+        })
+        songs = songs[songs['plays'] > 0]
+
+        bucket = np.searchsorted(SESSION_POSITION_BUCKETS, position + 1, side='right') - 1
+        bucket_plays = np.bincount(bucket, minlength=len(SESSION_POSITION_BUCKETS))
+        positions = pd.DataFrame({
+            'Position': SESSION_POSITION_LABELS,
+            'Plays': bucket_plays,
+            'Skip Rate': _rate(np.bincount(bucket, weights=(~real).astype(np.float64), minlength=len(SESSION_POSITION_BUCKETS)), bucket_plays),
+            'Completion Rate': _rate(np.bincount(bucket, weights=completed.astype(np.float64), minlength=len(SESSION_POSITION_BUCKETS)), bucket_plays),
+        })
+
+        store.session_cache[cache_key] = {'sessions': sessions, 'runs': runs, 'songs': songs, 'positions': positions}
+    return store.session_cache[cache_key]
+
+class CoListeningMatrix:
+    """Sparse song x song co-occurrence counts, pruned to the top-k partners per song
+
+    Row i of the CSR arrays lists the songs most often really played in the
+    same bucket (day or session) as song i: indices are song keys, counts the
+    shared buckets and scores the cosine-normalised counts.
+    """
+
+    def __init__(self, indptr, indices, counts, scores):
+        self.indptr = indptr
+        self.indices = indices
+        self.counts = counts
+        self.scores = scores
+
+    @classmethod
+    def build(cls, song, bucket, top_k=CO_LISTEN_TOP_K, chunk_pairs=CO_LISTEN_CHUNK_PAIRS):
+        """Count co-occurring (song, song) pairs over unique (bucket, song) memberships
+
+        Rows are built a block of songs at a time: a block's pairs are expanded,
+        counted exactly and pruned to the top_k partners per song before the next
+        block starts, so memory is bounded by chunk_pairs plus the pruned result.
+        """
+        n_songs = int(song.max()) + 1 if len(song) else 0
+        members = np.unique(bucket.astype(np.int64) * n_songs + song)
+        member_song = members % max(n_songs, 1)
+        member_bucket = members // max(n_songs, 1)
+        bucket_starts = np.flatnonzero(np.r_[True, member_bucket[1:] != member_bucket[:-1]])[:len(members)]
+        bucket_sizes = np.diff(np.r_[bucket_starts, len(members)])
+        buckets_per_song = np.bincount(member_song, minlength=n_songs)
+        member_start = np.repeat(bucket_starts, bucket_sizes)
+        member_size = np.repeat(bucket_sizes, bucket_sizes)
+
+        # Memberships grouped by song, cut between songs so each block expands to about chunk_pairs pairs
+        by_song = np.argsort(member_song, kind='stable')
+        song_starts = np.flatnonzero(np.r_[True, np.diff(member_song[by_song]) != 0])[:len(by_song)]
+        pair_totals = np.cumsum(member_size[by_song] - 1)
+        limits = np.searchsorted(pair_totals, np.arange(chunk_pairs, pair_totals[-1] if len(pair_totals) else 0, chunk_pairs))
+        cuts = np.unique(song_starts[np.searchsorted(song_starts, limits, side='right') - 1])
+        parts = []
+        for block in np.split(by_song, cuts[cuts > 0]):
+            if len(block) == 0:
+                continue
+            # Each membership is paired with every member of its bucket, itself excluded below
+            sizes = member_size[block]
+            left = np.repeat(block, sizes)
+            right = np.repeat(member_start[block], sizes) + (np.arange(len(left)) - np.repeat(np.cumsum(sizes) - sizes, sizes))
+            distinct = left != right
+            keys, counts = np.unique(member_song[left[distinct]] * n_songs + member_song[right[distinct]], return_counts=True)
+            rows = keys // n_songs
+            cols = keys % n_songs
+            scores = counts / np.sqrt(buckets_per_song[rows] * buckets_per_song[cols])
+            # Keep the top_k partners per row: most shared buckets first, then score
+            order = np.lexsort((-scores, -counts, rows))
+            rows, cols, counts, scores = rows[order], cols[order], counts[order], scores[order]
+            keep = np.arange(len(rows)) - np.searchsorted(rows, rows, side='left') < top_k
+            parts.append((rows[keep], cols[keep], counts[keep], scores[keep]))
+
+        rows, cols, counts, scores = (np.concatenate([part[i] for part in parts]) if parts else np.zeros(0)
+                                      for i in range(4))
+        indptr = np.r_[0, np.cumsum(np.bincount(rows.astype(np.int64), minlength=n_songs))].astype(np.int64)
+        return cls(indptr, cols.astype(np.int32), counts.astype(np.int32), scores.astype(np.float32))
+
+    def related(self, song_key, n=10):
+        """Songs most often played together with song_key"""
+        if song_key is None or song_key + 1 >= len(self.indptr):
+            return pd.DataFrame(columns=['song_key', 'together', 'score'])
+        lo, hi = self.indptr[song_key], self.indptr[song_key + 1]
+        hi = min(hi, lo + n)
+        return pd.DataFrame({
+            'song_key': self.indices[lo:hi],
+            'together': self.counts[lo:hi],
+            'score': self.scores[lo:hi].astype(float),
+        })
+
+def co_listening(store, together='day', real_ms=DEFAULT_FIXATION.real_ms, gap_minutes=SESSION_GAP_MINUTES):
+    """Co-listening matrix over real plays sharing a day or a session, cached on the store"""
+    cache_key = (together, real_ms, gap_minutes if together == 'session' else None)
+    if cache_key not in store.colisten_cache:
+        plays = store.chronological_plays()
+        ts = plays['ts'].to_numpy(dtype=np.int64)
+        ms_played = plays['ms_played'].to_numpy(dtype=np.int64)
+        if together == 'session':
+            bucket, _, _ = sessionize(ts, ms_played, gap_minutes * 60 * 1000)
+        else:
+            bucket = ts // MS_PER_DAY
+        real = ms_played >= real_ms
+        store.colisten_cache[cache_key] = CoListeningMatrix.build(
+            plays['song_key'].to_numpy(dtype=np.int64)[real], bucket[real])
+    return store.colisten_cache[cache_key]
+
+class FixationTimeline:
+    """Sparse daily rolling-fixation series, stored CSR-style by day
+
+    Row d (day0 + d) lists the songs whose window ending that day qualifies:
+    indices[indptr[d]:indptr[d + 1]] are song keys and data the fixations.
+    """
+
+    def __init__(self, day0, indptr, indices, data):
+        self.day0 = int(day0)
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    @classmethod
+    def build(cls, batches, params, chunk_song_days=TIMELINE_CHUNK_SONG_DAYS):
+        """Evaluate the window ending on every day within window_days after a play"""
+        window = params.window_days
+        days, songs, values = [], [], []
+        for batch in batches:
+            if len(batch) == 0:
+                continue
+            song = batch['song_key'].to_numpy(dtype=np.int64)
+            day = batch['day'].to_numpy(dtype=np.int64)
+            real_cumsum = np.r_[0, np.cumsum(batch['ms_played'].to_numpy() >= params.real_ms)]
+            selected_cumsum = np.r_[0, np.cumsum(batch['reason_start'].to_numpy(dtype=object) == params.selection_reason)]
+            offset = day - day.min() + 1
+            stride = offset.max() + window + 2
+            key = song * stride + offset
+
+            # Every (song, day) with plays opens window_days + 1 candidate end days; expand
+            # them a bounded number of song-days at a time, cutting only between songs
+            pair_keys = np.unique(key)
+            song_starts = np.flatnonzero(np.r_[True, np.diff(pair_keys // stride) != 0])
+            limits = np.arange(chunk_song_days, len(pair_keys), chunk_song_days)
+            cuts = np.unique(song_starts[np.searchsorted(song_starts, limits, side='right') - 1])
+            for chunk in np.split(pair_keys, cuts[cuts > 0]):
+                end_keys = np.unique((chunk[:, None] + np.arange(window + 1)).ravel())
+                hi = np.searchsorted(key, end_keys, side='right')
+                lo = np.searchsorted(key, end_keys - window, side='left')
+                real = real_cumsum[hi] - real_cumsum[lo]
+                keep = real >= params.min_real_plays
+                total = (hi - lo)[keep]
+                selected = (selected_cumsum[hi] - selected_cumsum[lo])[keep]
+                songs.append((end_keys[keep] // stride).astype(np.int32))
+                days.append((end_keys[keep] % stride - 1 + day.min()).astype(np.int32))
+                values.append((real[keep] + selected / total).astype(np.float32))
+
+        # No window may qualify at all, e.g. a tiny history or a high minimum of real plays
+        if sum(len(chunk) for chunk in days) == 0:
+            return cls(0, np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32))
+        days, songs, values = np.concatenate(days), np.concatenate(songs), np.concatenate(values)
+        order = np.lexsort((songs, days))
+        days, songs, values = days[order], songs[order], values[order]
+        day0 = days[0]
+        indptr = np.r_[0, np.cumsum(np.bincount(days - day0))].astype(np.int64)
+        return cls(day0, indptr, songs, values)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(arrays['day0'], arrays['indptr'], arrays['indices'], arrays['data'])
+
+    def save(self, path):
+        # A unique temporary file per call: sessions are threads of one process
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=os.path.basename(path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, day0=self.day0, indptr=self.indptr, indices=self.indices, data=self.data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def _rows(self, start_day, end_day):
+        """Entry offsets covering days start_day..end_day inclusive"""
+        first = min(max(start_day - self.day0, 0), len(self.indptr) - 1)
+        last = min(max(end_day - self.day0 + 1, 0), len(self.indptr) - 1)
+        return self.indptr[first], self.indptr[max(first, last)]
+
+    def top_on(self, day, n=10):
+        """Top n songs by rolling fixation on one day"""
+        return self.top_over(day, day, n)
+
+    def top_over(self, start_day, end_day, n=10):
+        """Top n songs by their highest rolling fixation between two days, with the day it was reached"""
+        lo, hi = self._rows(start_day, end_day)
+        songs = self.indices[lo:hi]
+        values = self.data[lo:hi]
+        entry_days = np.searchsorted(self.indptr, np.arange(lo, hi), side='right') - 1 + self.day0
+        # Highest value per song, earliest day on ties
+        order = np.lexsort((entry_days, -values, songs))
+        first = order[np.r_[True, songs[order][1:] != songs[order][:-1]]] if len(order) else order
+        best = first[np.argsort(-values[first], kind='stable')][:n]
+        return pd.DataFrame({
+            'song_key': songs[best],
+            'fixation': values[best].astype(float),
+            'date': [day_to_date(day) for day in entry_days[best]],
+        })
+
+def fixation_timeline(store, params=DEFAULT_FIXATION):
+    """Daily fixation timeline for the store, cached in memory
+
+    Only stores whose dataset itself lives on disk (SQLite databases and the
+    published shared dataset) also keep it in CACHE_DIR; timelines of
+    in-memory stores and uploads would otherwise pile up there unevicted.
+    """
+    if params not in store.timeline_cache:
+        name = "timeline-{}-{}-{}-{}-{}.npz".format(store.version, *params)
+        path = os.path.join(CACHE_DIR, name)
+        persist = isinstance(store, SQLiteHistory) or getattr(store, 'shared', False)
+        if persist and os.path.exists(path):
+            timeline = FixationTimeline.load(path)
+        else:
+            timeline = FixationTimeline.build(store.iter_play_batches(), params)
+            if persist:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                timeline.save(path)
+        store.timeline_cache[params] = timeline
+    return store.timeline_cache[params]
+
+def _hash_values(values, seed=0):
+    """64-bit hashes of strings; each seed gives an independent hash function"""
+    return pd.util.hash_array(np.asarray(values, dtype=object), hash_key=f"{seed:016d}", categorize=False)
+
+class HyperLogLog:
+    """Distinct-count sketch with 2**precision registers (~1.04/sqrt(m) relative standard error)"""
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values):
+        hashes = _hash_values(values)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        # Position of the leftmost set bit in the remaining 64-p bits (exact, since 64-p <= 53)
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        rank = (64 - self.precision) - bit_length + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def relative_error(self):
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int((self.registers == 0).sum())
+        if raw <= 2.5 * m and zeros > 0:
+            # Small-range correction (linear counting)
+            return m * np.log(m / zeros)
+        return raw
+
+class CountMinTopK:
+    """Count-min sketch with a bounded candidate heap for heavy hitters
+
+    Estimates never undercount; with probability 1 - e**-depth they overcount
+    by at most e / width of the total count.
+    """
+
+    def __init__(self, width=4096, depth=4, capacity=100):
+        self.width = width
+        self.depth = depth
+        self.capacity = capacity
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+        self.candidates = []
+
+    def _columns(self, keys):
+        return [(_hash_values(keys, seed=row + 1) % np.uint64(self.width)).astype(np.int64) for row in range(self.depth)]
+
+    def _estimates(self, keys):
+        columns = self._columns(keys)
+        return np.min([self.table[row, columns[row]] for row in range(self.depth)], axis=0)
+
+    def add(self, keys):
+        keys = np.asarray(keys, dtype=object)
+        if len(keys) == 0:
+            return
+        for row, column in enumerate(self._columns(keys)):
+            np.add.at(self.table[row], column, 1)
+        self.total += len(keys)
+        # Re-rank the current candidates together with every key seen in this batch
+        pool = list(dict.fromkeys(list(self.candidates) + pd.unique(keys).tolist()))
+        estimates = self._estimates(pool)
+        self.candidates = [key for _, key in heapq.nlargest(self.capacity, zip(estimates.tolist(), pool), key=lambda item: item[0])]
+
+    def error_bound(self):
+        return int(np.ceil(np.e / self.width * self.total))
+
+    def top(self, n):
+        if not self.candidates:
+            return []
+        estimates = self._estimates(self.candidates).tolist()
+        return heapq.nlargest(n, zip(self.candidates, estimates), key=lambda item: item[1])
+
+class StreamingSummary:
+    """Single-pass Dashboard figures, updated from each decoded export member
+
+    Real plays, hours and monthly counts are exact; unique counts come from
+    HyperLogLog and the top lists from count-min sketches.
+    """
+
+    def __init__(self):
+        self.tracks = HyperLogLog()
+        self.artists = HyperLogLog()
+        self.top_artist_counts = CountMinTopK()
+        self.top_song_counts = CountMinTopK()
+        self.real_plays = 0
+        self.ms_played = 0
+        self.monthly = pd.Series(dtype='int64')
+        self.records = 0
+        self.updates = 0
+
+    def update(self, frame):
+        self.records += len(frame)
+        self.updates += 1
+        if 'master_metadata_track_name' not in frame.columns or len(frame) == 0:
+            return
+        music = frame[frame['master_metadata_track_name'].notna() & frame['master_metadata_album_artist_name'].notna()]
+        tracks = music['master_metadata_track_name'].to_numpy(dtype=object)
+        artists = music['master_metadata_album_artist_name'].to_numpy(dtype=object)
+        real = (music['ms_played'] >= DEFAULT_FIXATION.real_ms).to_numpy()
+
+        self.tracks.add(tracks)
+        self.artists.add(artists)
+        self.top_artist_counts.add(artists[real])
+        self.top_song_counts.add(artists[real] + SONG_KEY_SEPARATOR + tracks[real])
+        self.real_plays += int(real.sum())
+        self.ms_played += int(music['ms_played'].sum())
+        self.monthly = self.monthly.add(music['ts'].str[:7].value_counts(), fill_value=0).astype('int64')
+
+    def overview(self):
+        return {
+            'real_plays': self.real_plays,
+            'unique_tracks': int(round(self.tracks.estimate())),
+            'unique_artists': int(round(self.artists.estimate())),
+            'hours': self.ms_played / (1000*60*60),
+        }
+
+    def error_bounds(self):
+        """Approximate 95% bounds for the sketched figures"""
+        overview = self.overview()
+        return {
+            'unique_tracks': int(np.ceil(2 * self.tracks.relative_error() * overview['unique_tracks'])),
+            'unique_artists': int(np.ceil(2 * self.artists.relative_error() * overview['unique_artists'])),
+            'top_artists': self.top_artist_counts.error_bound(),
+            'top_songs': self.top_song_counts.error_bound(),
+        }
+
+    def top_artists(self, n=10):
+        return pd.DataFrame(self.top_artist_counts.top(n), columns=['Artist', 'Real Plays'])
+
+    def top_songs(self, n=10):
+        top = [key.split(SONG_KEY_SEPARATOR, 1) + [count] for key, count in self.top_song_counts.top(n)]
+        top = pd.DataFrame(top, columns=['Artist', 'Track', 'Real Plays'])
+        return top[['Track', 'Artist', 'Real Plays']]
+
+    def monthly_plays(self):
+        monthly = self.monthly.sort_index().reset_index()
+        monthly.columns = ['month', 'plays']
+        return monthly
+
+def iter_song_list_export(songs, fmt, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield a song list in the given export format as text chunks of at most chunk_rows songs"""
+    if fmt == 'M3U':
+        yield "#EXTM3U\n"
+    elif fmt == 'JSON':
+        yield "["
+    for start in range(0, len(songs), chunk_rows):
+        chunk = songs.iloc[start:start + chunk_rows]
+        track = chunk['master_metadata_track_name'].astype(str)
+        artist = chunk['master_metadata_album_artist_name'].astype(str)
+        if fmt == 'Text':
+            yield (track + " - " + artist).str.cat(sep="\n") + "\n"
+        elif fmt == 'CSV':
+            yield chunk.drop(columns=['song_key'], errors='ignore').to_csv(index=False, header=start == 0)
+        elif fmt == 'M3U':
+            # Entries without a track URI have nothing to point at
+            located = chunk['spotify_track_uri'].notna()
+            entries = "#EXTINF:-1," + artist[located] + " - " + track[located] + "\n" + chunk.loc[located, 'spotify_track_uri']
+            if located.any():
+                yield entries.str.cat(sep="\n") + "\n"
+        elif fmt == 'JSON':
+            records = pd.DataFrame({
+                'track': track, 'artist': artist, 'spotify_track_uri': chunk['spotify_track_uri'],
+            }).to_json(orient='records', force_ascii=False)
+            yield ("," if start else "") + records[1:-1]
+    if fmt == 'JSON':
+        yield "]"
+
+def export_song_list(songs, fmt):
+    """Encode a whole song list export; called lazily by the download button"""
+    return "".join(iter_song_list_export(songs, fmt)).encode('utf-8')
+
+def fixation_settings(store):
+    """Fixation parameter controls shared by the analysis pages; returns the chosen FixationParams"""
+    current = st.session_state.fixation_params
+    reasons = store.reasons()
+    if current.selection_reason not in reasons:
+        reasons = [current.selection_reason] + reasons
+    with st.expander("Fixation settings"):
+        col1, col2, col3, col4 = st.columns(4)
+        real_seconds = col1.select_slider(
+            "Real play threshold (s)", [ms // 1000 for ms in SWEEP_REAL_MS], value=current.real_ms // 1000,
+            help="Plays at least this long count as real plays; shorter ones are skips")
+        window_days = col2.select_slider("Window length (days)", SWEEP_WINDOW_DAYS, value=current.window_days)
+        selection_reason = col3.selectbox(
+            "Selection reason", reasons, index=reasons.index(current.selection_reason),
+            help="Plays started this way count as deliberate selections")
+        min_real_plays = col4.number_input("Minimum real plays", min_value=1, max_value=20, value=current.min_real_plays)
+    st.session_state.fixation_params = FixationParams(
+        real_ms=real_seconds * 1000, window_days=window_days,
+        selection_reason=selection_reason, min_real_plays=int(min_real_plays))
+    return st.session_state.fixation_params
+
+def chart_bucket(first_day, last_day, finest='D', max_points=CHART_MAX_POINTS):
+    """Finest time bucket, no finer than `finest`, that spans the visible day range in at most max_points buckets"""
+    buckets = list(CHART_BUCKETS)
+    for bucket in buckets[buckets.index(finest):]:
+        if (last_day - first_day) / CHART_BUCKETS[bucket][2] + 1 <= max_points:
+            return bucket
+    return buckets[-1]
+
+def bucket_plays(day, bucket):
+    """Play counts per non-empty time bucket, keyed by the bucket's first day as a date"""
+    day = np.asarray(day, dtype=np.int64)
+    if bucket == 'D':
+        starts = day
+    elif bucket == 'W':
+        # Weeks start on Monday; day 0 (1970-01-01) was a Thursday
+        starts = day - (day + 3) % 7
+    else:
+        starts = day.astype('datetime64[D]').astype(f'datetime64[{bucket}]').astype('datetime64[D]').astype(np.int64)
+    values, counts = np.unique(starts, return_counts=True)
+    return pd.DataFrame({'date': values.astype('datetime64[D]'), 'plays': counts})
+
+def downsample_minmax(frame, column, max_points=CHART_MAX_POINTS):
+    """Cap a sorted series at max_points rows, keeping the min and max row of each of max_points // 2 segments"""
+    n = len(frame)
+    if n <= max_points:
+        return frame
+    segments = max_points // 2
+    segment = np.arange(n) * segments // n
+    order = np.lexsort((frame[column].to_numpy(), segment))
+    starts = np.searchsorted(segment[order], np.arange(segments))
+    ends = np.r_[starts[1:], n] - 1
+    return frame.iloc[np.unique(np.r_[order[starts], order[ends]])]
+
+def cached_figure(store, key, build):
+    """Figure for key on this store's dataset version, built on the first rerun that asks for it"""
+    cache_key = key + (store.version,)
+    if cache_key not in store.chart_cache:
+        store.chart_cache[cache_key] = build()
+    return store.chart_cache[cache_key]
+
+def monthly_plays_figure(monthly_data):
+    """Monthly listening bar chart, capped at CHART_MAX_POINTS bars"""
+    fig = px.bar(downsample_minmax(monthly_data, 'plays'), x='month', y='plays', title='Monthly Listening Activity')
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='white'
+    )
+    return fig
+
+def monthly_chart(store):
+    """Cached monthly listening chart for the Dashboard"""
+    return cached_figure(store, ('monthly_plays', None, 'M'), lambda: monthly_plays_figure(store.monthly_plays()))
+
+def play_scatter_chart(store, song_key, song_data):
+    """Cached play scatter for one song, bucketed to fit its play range"""
+    bucket = chart_bucket(int(song_data['day'].min()), int(song_data['day'].max()))
+    label, axis, _ = CHART_BUCKETS[bucket]
+
+    def build():
+        plays = downsample_minmax(bucket_plays(song_data['day'].to_numpy(), bucket), 'plays').rename(columns={'date': axis})
+        fig = px.scatter(plays, x=axis, y='plays', title=f'{label} Play Scatter Plot')
+        fig.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font_color='white')
+        return fig
+
+    return cached_figure(store, ('play_scatter', song_key, bucket), build)
+
+def render_overview(overview, top_artists, top_songs, monthly_figure, error_bounds=None, chart_key=None):
+    """Overview metrics, top lists and monthly chart; error_bounds marks the figures as streaming estimates
+
+    chart_key tells repeated renders within one run apart, such as the provisional previews.
+    """
+    error_bounds = error_bounds or {}
+    approx = "~" if error_bounds else ""
     
-    max_fixation = 0
-    peak_date = None
-    best_window_stats = {}
+    # Metrics cards
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Real Plays", f"{overview['real_plays']:,}")
+    col2.metric("Unique Tracks", f"{approx}{overview['unique_tracks']:,}",
+                help=f"± {error_bounds['unique_tracks']:,} (HyperLogLog, ~95%)" if error_bounds else None)
+    col3.metric("Unique Artists", f"{approx}{overview['unique_artists']:,}",
+                help=f"± {error_bounds['unique_artists']:,} (HyperLogLog, ~95%)" if error_bounds else None)
+    col4.metric("Hours", f"{overview['hours']:,.0f}")
     
-    for end_date in dates:
-        start_date = end_date - timedelta(days=30)
-        window_df = song_df[(song_df['date'] >= start_date) & (song_df['date'] <= end_date)]
-        
-        if len(window_df) == 0:
-            continue
-            
-        real_plays = (window_df['ms_played'] >= 25000).sum()
-        if real_plays < 2:
-            continue
-            
-        total_plays = len(window_df)
-        selections = (window_df['reason_start'] == 'clickrow').sum()
-        skips = (window_df['ms_played'] < 25000).sum()
-        
-        fixation = float(real_plays) + (float(selections) / float(total_plays))
-        
-        if fixation > max_fixation:
-            max_fixation = fixation
-            peak_date = end_date
-            best_window_stats = {
-                'real_plays': int(real_plays),
-                'selections': int(selections),
-                'skips': int(skips),
-                'total_plays': int(total_plays)
-            }
-    
-    return max_fixation, peak_date, best_window_stats
-
-def calculate_monthly_peak_fixations(song_df):
+    # Top 10 Artists and Songs based on real plays
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown("### Top 10 Artists")
+        st.dataframe(top_artists, width='stretch', hide_index=True)
+        if error_bounds:
+            st.caption(f"Count-min estimates: may overcount by up to {error_bounds['top_artists']:,} plays")
+    
+    with col2:
+        st.markdown("### Top 10 Songs")
+        st.dataframe(top_songs, width='stretch', hide_index=True)
+        if error_bounds:
+            st.caption(f"Count-min estimates: may overcount by up to {error_bounds['top_songs']:,} plays")
+    
+    # Monthly listening graph
+    st.markdown("### Monthly Listening Activity")
+    st.plotly_chart(monthly_figure, use_container_width=True, key=chart_key)
+
+def song_list_export(songs, key, file_stem="spotify_playlist"):
+    """Format picker and download button for a song list, leaving out filtered songs"""
+    song_id = songs['master_metadata_album_artist_name'] + " - " + songs['master_metadata_track_name']
+    songs = songs[~song_id.isin(st.session_state.filtered_songs)]
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        fmt = st.selectbox("Export format", list(EXPORT_FORMATS), key=f"{key}_format")
+    with col2:
+        extension, mime = EXPORT_FORMATS[fmt]
+        st.download_button(
+            label=f"Export Song List ({len(songs):,} songs)",
+            data=partial(export_song_list, songs, fmt),
+            file_name=f"{file_stem}.{extension}",
+            mime=mime,
+            key=f"{key}_download",
+            on_click="ignore",
+            width='stretch',
+        )
+
+def calculate_monthly_peak_fixations(song_df, params=DEFAULT_FIXATION):
     """Calculate peak fixation for each month using rolling windows"""
     song_df = song_df.copy()  # Work with a copy to avoid warnings
     song_df = song_df.sort_values('date')
-    song_df['month'] = pd.to_datetime(song_df['ts'], utc=True).dt.to_period('M')
+    song_df['month'] = pd.to_datetime(song_df['date']).dt.to_period('M')
     
     monthly_peaks = {}
     
@@ -222,14 +1113,14 @@ def calculate_monthly_peak_fixations(song_df):
         if len(month_data) == 0:
             continue
             
-        # For this month, calculate the best 30-day window that overlaps with this month
+        # For this month, calculate the best window that overlaps with this month
         month_start = month.start_time.date()
         month_end = month.end_time.date()
         
         max_fixation = 0
         
         for end_date in month_data['date'].unique():
-            start_date = end_date - timedelta(days=30)
+            start_date = end_date - timedelta(days=params.window_days)
             # Only consider windows that overlap with this month
             if start_date <= month_end and end_date >= month_start:
                 window_df = song_df[(song_df['date'] >= start_date) & (song_df['date'] <= end_date)]
@@ -237,12 +1128,12 @@ def calculate_monthly_peak_fixations(song_df):
                 if len(window_df) == 0:
                     continue
                     
-                real_plays = (window_df['ms_played'] >= 25000).sum()
-                if real_plays < 2:
+                real_plays = (window_df['ms_played'] >= params.real_ms).sum()
+                if real_plays < params.min_real_plays:
                     continue
                     
                 total_plays = len(window_df)
-                selections = (window_df['reason_start'] == 'clickrow').sum()
+                selections = (window_df['reason_start'] == params.selection_reason).sum()
                 
                 fixation = float(real_plays) + (float(selections) / float(total_plays))
                 max_fixation = max(max_fixation, fixation)
@@ -251,21 +1142,628 @@ def calculate_monthly_peak_fixations(song_df):
     
     return monthly_peaks
 
-def calculate_fixation_for_period(song_df, start_date, end_date):
+def calculate_fixation_for_period(song_df, start_date, end_date, params=DEFAULT_FIXATION):
     """Calculate fixation for a specific period"""
     period_df = song_df[(song_df['date'] >= start_date) & (song_df['date'] <= end_date)]
     if len(period_df) == 0:
         return 0
     
-    real_plays = (period_df['ms_played'] >= 25000).sum()
-    if real_plays < 2:
+    real_plays = (period_df['ms_played'] >= params.real_ms).sum()
+    if real_plays < params.min_real_plays:
         return 0
     
     total_plays = len(period_df)
-    selections = (period_df['reason_start'] == 'clickrow').sum()
+    selections = (period_df['reason_start'] == params.selection_reason).sum()
     
     return float(real_plays) + (float(selections) / float(total_plays))
 
+def day_to_date(day):
+    """Convert a day number (days since the Unix epoch, UTC) to a date"""
+    return EPOCH_DATE + timedelta(days=int(day))
+
+def date_to_day(value):
+    """Convert a date to a day number (days since the Unix epoch, UTC)"""
+    return (value - EPOCH_DATE).days
+
+def _add_dates(frame):
+    """Attach a 'date' column derived from the integer 'day' column"""
+    frame = frame.copy()
+    frame['date'] = pd.to_datetime(frame['day'], unit='D').dt.date
+    return frame
+
+def _whole_song_chunks(chunks, group_of=None):
+    """Re-cut chunks of plays sorted by song_key so that no song spans two chunks
+
+    group_of maps song_key to a coarser key that is monotonic in song_key (such
+    as the artist); chunks are then cut only between those groups.
+    """
+    carry = None
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        if len(chunk) == 0:
+            continue
+        # The last song (or group) of a chunk may continue in the next one
+        keys = chunk['song_key'].to_numpy() if group_of is None else group_of[chunk['song_key'].to_numpy()]
+        complete = chunk[keys != keys[-1]]
+        carry = chunk[keys == keys[-1]]
+        if len(complete) > 0:
+            yield complete
+    if carry is not None and len(carry) > 0:
+        yield carry
+
+def _compact_plays(plays):
+    """Cast a plays table to its compact column types
+
+    Artist, track, album and URI strings live once per song in the songs table
+    and reasons become categoricals, so a play costs a few fixed-width integers.
+    """
+    return plays.astype(PLAY_DTYPES)
+
+def _pack_flags(records):
+    """Pack the boolean export fields into one bit set per record; missing or null fields are False"""
+    flags = np.zeros(len(records), dtype='uint8')
+    for column, bit in PLAY_FLAGS.items():
+        if column in records.columns:
+            flags |= records[column].eq(True).to_numpy(dtype=bool) * np.uint8(bit)
+    return flags
+
+def prepare_history(data):
+    """Split raw export records into the plays and songs tables shared by every storage backend"""
+    music = data[data['master_metadata_track_name'].notna() & data['master_metadata_album_artist_name'].notna()]
+    ts = pd.to_datetime(music['ts'], utc=True).values.astype('datetime64[ms]').astype('int64')
+    song_key = music.groupby(['master_metadata_album_artist_name', 'master_metadata_track_name'], sort=True).ngroup()
+
+    plays = _compact_plays(pd.DataFrame({
+        'song_key': song_key.to_numpy(),
+        'day': ts // MS_PER_DAY,
+        'ts': ts,
+        'ms_played': music['ms_played'].to_numpy(),
+        'reason_start': music['reason_start'].to_numpy(dtype=object),
+        'reason_end': music['reason_end'].to_numpy(dtype=object),
+        'flags': _pack_flags(music),
+    }))
+    plays = plays.sort_values(['ts', 'song_key'], kind='stable').reset_index(drop=True)
+
+    songs = music.groupby(song_key.to_numpy()).agg(
+        artist=('master_metadata_album_artist_name', 'first'),
+        track=('master_metadata_track_name', 'first'),
+        album=('master_metadata_album_album_name', 'first'),
+        uri=('spotify_track_uri', 'first')
+    )
+    songs.index.name = 'song_key'
+    songs = songs.reset_index()
+
+    digest = hashlib.sha1()
+    digest.update(pd.util.hash_pandas_object(plays, index=False).values.tobytes())
+    digest.update(pd.util.hash_pandas_object(songs[['artist', 'track']], index=False).values.tobytes())
+    return plays, songs, digest.hexdigest()[:16]
+
+def _song_labels(stats, songs):
+    """Join artist/track names and track URIs onto per-song aggregates and add the string song_id used for filtering"""
+    stats = songs[['song_key', 'artist', 'track', 'uri']].merge(stats, on='song_key')
+    stats = stats.rename(columns={'artist': 'master_metadata_album_artist_name', 'track': 'master_metadata_track_name',
+                                  'uri': 'spotify_track_uri'})
+    stats['song_id'] = stats['master_metadata_album_artist_name'] + " - " + stats['master_metadata_track_name']
+    return stats
+
+class InMemoryHistory:
+    """Prepared listening history held in pandas frames for the lifetime of the session"""
+
+    backend = 'In-memory'
+
+    def __init__(self, plays, songs, version):
+        self.plays = plays
+        self.songs = songs
+        self.version = version
+        self.fixation_cache = {}
+        self.timeline_cache = {}
+        self.rollup_cache = {}
+        self.session_cache = {}
+        self.colisten_cache = {}
+        self.chart_cache = {}
+        self.stats_cache = {}
+        self._by_song = None
+
+    def __len__(self):
+        return len(self.plays)
+
+    def footprint(self):
+        """Bytes held per plays column and for the song dictionary"""
+        sizes = self.plays.memory_usage(index=False, deep=True).to_dict()
+        sizes['song dictionary'] = int(self.songs.memory_usage(index=False, deep=True).sum())
+        return sizes
+
+    def frames(self):
+        return self.plays, self.songs
+
+    def chronological_plays(self):
+        """Columns needed for sessionizing, in timestamp order, with completed plays flagged"""
+        plays = self.plays[['song_key', 'ts', 'ms_played']].copy()
+        plays['completed'] = (self.plays['reason_end'] == 'trackdone').to_numpy()
+        return plays
+
+    def day_range(self):
+        return int(self.plays['day'].min()), int(self.plays['day'].max())
+
+    def reasons(self):
+        return sorted(self.plays['reason_start'].dropna().unique().tolist())
+
+    def overview(self):
+        return {
+            'real_plays': int((self.plays['ms_played'] >= DEFAULT_FIXATION.real_ms).sum()),
+            'unique_tracks': int(self.songs['track'].nunique()),
+            'unique_artists': int(self.songs['artist'].nunique()),
+            'hours': self.plays['ms_played'].sum() / (1000*60*60),
+        }
+
+    def top_songs(self, n=10):
+        real = self.plays[self.plays['ms_played'] >= DEFAULT_FIXATION.real_ms]
+        counts = real['song_key'].value_counts().rename('Real Plays').reset_index()
+        # Ties in play count go to the lower song_key, as in the SQLite backend
+        counts = counts.sort_values(['Real Plays', 'song_key'], ascending=[False, True]).head(n)
+        top = counts.merge(self.songs, on='song_key', how='left')
+        top = top.rename(columns={'track': 'Track', 'artist': 'Artist'})
+        return top[['Track', 'Artist', 'Real Plays']]
+
+    def monthly_plays(self):
+        months = pd.to_datetime(self.plays['day'], unit='D').dt.to_period('M')
+        monthly = months.value_counts().sort_index().reset_index()
+        monthly.columns = ['month', 'plays']
+        monthly['month'] = monthly['month'].astype(str)
+        return monthly
+
+    def song_stats(self, since=None, params=DEFAULT_FIXATION):
+        """Per-song aggregates, optionally restricted to plays on or after `since`, cached per (since, params)"""
+        since_day = date_to_day(since) if since is not None else None
+        if (since_day, params) not in self.stats_cache:
+            plays = self.plays
+            if since_day is not None:
+                plays = plays[plays['day'] >= since_day]
+            flags = pd.DataFrame({
+                'song_key': plays['song_key'],
+                'real': plays['ms_played'] >= params.real_ms,
+                'selected': plays['reason_start'] == params.selection_reason,
+                'day': plays['day'],
+            })
+            stats = flags.groupby('song_key').agg(
+                total_plays=('real', 'size'),
+                real_plays=('real', 'sum'),
+                selections=('selected', 'sum'),
+                first_day=('day', 'min'),
+                last_day=('day', 'max')
+            ).reset_index()
+            stats['skips'] = stats['total_plays'] - stats['real_plays']
+            self.stats_cache[(since_day, params)] = _finish_song_stats(stats, self.songs)
+        return self.stats_cache[(since_day, params)]
+
+    def songs_table(self):
+        return self.songs
+
+    def song_names(self, song_keys):
+        return self.songs.set_index('song_key').loc[list(song_keys)].reset_index()
+
+    def find_song(self, artist, track):
+        match = self.songs[(self.songs['artist'] == artist) & (self.songs['track'] == track)]
+        return int(match['song_key'].iat[0]) if len(match) > 0 else None
+
+    def song_plays(self, song_key):
+        return _add_dates(self.plays[self.plays['song_key'] == song_key])
+
+    def by_song(self):
+        """Plays ordered by (song_key, ts), computed once"""
+        if self._by_song is None:
+            self._by_song = self.plays.sort_values(['song_key', 'ts'], kind='stable').reset_index(drop=True)
+        return self._by_song
+
+    def iter_play_batches(self, since=None, group_of=None):
+        """Yield plays ordered by (song_key, day) in batches that never split a song (or group_of group)"""
+        plays = self.by_song()
+        if since is not None:
+            plays = plays[plays['day'] >= date_to_day(since)]
+        yield plays
+
+def _finish_song_stats(stats, songs):
+    """Shared tail of song_stats: dates, column order and names"""
+    stats['first_played'] = pd.to_datetime(stats['first_day'], unit='D').dt.date
+    stats['last_played'] = pd.to_datetime(stats['last_day'], unit='D').dt.date
+    stats = _song_labels(stats, songs)
+    return stats[['song_key', 'song_id', 'master_metadata_album_artist_name', 'master_metadata_track_name',
+                  'total_plays', 'real_plays', 'selections', 'skips', 'first_played', 'last_played', 'spotify_track_uri']]
+
+SQLITE_SCHEMA = """
+CREATE TABLE songs (
+    song_key INTEGER PRIMARY KEY,
+    artist TEXT NOT NULL,
+    track TEXT NOT NULL,
+    album TEXT,
+    uri TEXT
+);
+CREATE TABLE reasons (
+    code INTEGER PRIMARY KEY,
+    reason TEXT UNIQUE
+);
+CREATE TABLE plays (
+    song_key INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    ms_played INTEGER NOT NULL,
+    reason_start INTEGER,
+    reason_end INTEGER,
+    flags INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+SQLITE_INDEXES = """
+CREATE INDEX plays_song_day ON plays (song_key, day);
+CREATE INDEX plays_day ON plays (day);
+"""
+
+def _sql_values(series):
+    """Python values for sqlite3 parameters, with missing values as NULL"""
+    values = series.astype(object)
+    return values.where(series.notna(), None).tolist()
+
+class SQLiteHistory:
+    """Prepared listening history stored in an on-disk SQLite database
+
+    Only the connection lives in the session; aggregates run as SQL and
+    per-song plays are streamed from a cursor in (song_key, day) order.
+    """
+
+    backend = 'SQLite (on disk)'
+
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self.fixation_cache = {}
+        self.timeline_cache = {}
+        self.rollup_cache = {}
+        self.session_cache = {}
+        self.colisten_cache = {}
+        self.chart_cache = {}
+        self.stats_cache = {}
+        self.rows = self.conn.execute("SELECT COUNT(*) FROM plays").fetchone()[0]
+
+    @classmethod
+    def build(cls, plays, songs, version):
+        """Write the prepared tables to CACHE_DIR (once per dataset version) and open them"""
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = os.path.join(CACHE_DIR, f"history-{version}.sqlite")
+        if not os.path.exists(path):
+            # Sessions are threads of one process, so the temporary name must be unique per build
+            fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, prefix=f"history-{version}.", suffix='.tmp')
+            os.close(fd)
+            conn = sqlite3.connect(tmp_path)
+            try:
+                conn.executescript(SQLITE_SCHEMA)
+                reasons = pd.Index(plays['reason_start'].cat.categories).union(plays['reason_end'].cat.categories)
+                codes = {reason: code for code, reason in enumerate(reasons)}
+                conn.executemany("INSERT INTO reasons VALUES (?, ?)", [(code, reason) for reason, code in codes.items()])
+                # Insert in slices so only SQLITE_CHUNK_ROWS rows are ever converted to Python values at once
+                for start in range(0, len(songs), SQLITE_CHUNK_ROWS):
+                    chunk = songs.iloc[start:start + SQLITE_CHUNK_ROWS]
+                    conn.executemany("INSERT INTO songs VALUES (?, ?, ?, ?, ?)", zip(
+                        chunk['song_key'].tolist(), chunk['artist'].tolist(), chunk['track'].tolist(),
+                        _sql_values(chunk['album']), _sql_values(chunk['uri'])))
+                for start in range(0, len(plays), SQLITE_CHUNK_ROWS):
+                    chunk = plays.iloc[start:start + SQLITE_CHUNK_ROWS]
+                    conn.executemany("INSERT INTO plays VALUES (?, ?, ?, ?, ?, ?, ?)", zip(
+                        chunk['song_key'].tolist(), chunk['day'].tolist(), chunk['ts'].tolist(), chunk['ms_played'].tolist(),
+                        _sql_values(chunk['reason_start'].astype(object).map(codes).astype('Int64')),
+                        _sql_values(chunk['reason_end'].astype(object).map(codes).astype('Int64')),
+                        chunk['flags'].tolist()))
+                conn.executescript(SQLITE_INDEXES)
+                conn.commit()
+            except BaseException:
+                conn.close()
+                os.remove(tmp_path)
+                raise
+            conn.close()
+            if os.path.exists(path):
+                # Another build of the same version finished first
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+        return cls(path, version)
+
+    def __len__(self):
+        return self.rows
+
+    def footprint(self):
+        """Bytes of the database file; the session itself only holds a connection"""
+        return {'database file': os.path.getsize(self.path)}
+
+    def _reason_code(self, reason):
+        row = self.conn.execute("SELECT code FROM reasons WHERE reason = ?", (reason,)).fetchone()
+        return row[0] if row else -1
+
+    def frames(self):
+        plays = pd.read_sql_query(
+            "SELECT p.song_key, p.day, p.ts, p.ms_played, rs.reason AS reason_start, re.reason AS reason_end, p.flags "
+            "FROM plays p LEFT JOIN reasons rs ON rs.code = p.reason_start "
+            "LEFT JOIN reasons re ON re.code = p.reason_end ORDER BY p.rowid", self.conn)
+        songs = self.songs_table()
+        return _compact_plays(plays), songs
+
+    def chronological_plays(self):
+        """Columns needed for sessionizing, in timestamp order, with completed plays flagged
+
+        Rows are fetched SQLITE_CHUNK_ROWS at a time straight into typed arrays,
+        comparing the integer reason_end code so no reason strings are built.
+        """
+        song_key = np.empty(self.rows, dtype=np.int32)
+        ts = np.empty(self.rows, dtype=np.int64)
+        ms_played = np.empty(self.rows, dtype=np.uint32)
+        completed = np.empty(self.rows, dtype=bool)
+        cursor = self.conn.execute(
+            "SELECT song_key, ts, ms_played, IFNULL(reason_end = ?, 0) FROM plays ORDER BY rowid",
+            (self._reason_code('trackdone'),))
+        for start in range(0, self.rows, SQLITE_CHUNK_ROWS):
+            chunk = np.array(cursor.fetchmany(SQLITE_CHUNK_ROWS), dtype=np.int64).reshape(-1, 4)
+            end = start + len(chunk)
+            song_key[start:end], ts[start:end], ms_played[start:end], completed[start:end] = chunk.T
+        return pd.DataFrame({'song_key': song_key, 'ts': ts, 'ms_played': ms_played, 'completed': completed})
+
+    def day_range(self):
+        return self.conn.execute("SELECT MIN(day), MAX(day) FROM plays").fetchone()
+
+    def reasons(self):
+        return [row[0] for row in self.conn.execute(
+            "SELECT reason FROM reasons WHERE code IN (SELECT DISTINCT reason_start FROM plays) ORDER BY reason")]
+
+    def overview(self):
+        real_plays, total_ms = self.conn.execute(
+            "SELECT SUM(ms_played >= ?), SUM(ms_played) FROM plays", (DEFAULT_FIXATION.real_ms,)).fetchone()
+        unique_tracks, unique_artists = self.conn.execute(
+            "SELECT COUNT(DISTINCT track), COUNT(DISTINCT artist) FROM songs").fetchone()
+        return {
+            'real_plays': real_plays or 0,
+            'unique_tracks': unique_tracks,
+            'unique_artists': unique_artists,
+            'hours': (total_ms or 0) / (1000*60*60),
+        }
+
+    def top_songs(self, n=10):
+        return pd.read_sql_query(
+            "SELECT s.track AS Track, s.artist AS Artist, COUNT(*) AS \"Real Plays\" FROM plays p JOIN songs s USING (song_key) "
+            "WHERE p.ms_played >= ? GROUP BY p.song_key ORDER BY 3 DESC, p.song_key LIMIT ?", self.conn,
+            params=(DEFAULT_FIXATION.real_ms, n))
+
+    def monthly_plays(self):
+        return pd.read_sql_query(
+            "SELECT strftime('%Y-%m', day * 86400, 'unixepoch') AS month, COUNT(*) AS plays "
+            "FROM plays GROUP BY month ORDER BY month", self.conn)
+
+    def song_stats(self, since=None, params=DEFAULT_FIXATION):
+        """Per-song aggregates, optionally restricted to plays on or after `since`, cached per (since, params)"""
+        since_day = date_to_day(since) if since is not None else None
+        if (since_day, params) not in self.stats_cache:
+            where = "WHERE day >= :since" if since_day is not None else ""
+            stats = pd.read_sql_query(
+                "SELECT song_key, COUNT(*) AS total_plays, SUM(ms_played >= :real_ms) AS real_plays, "
+                "SUM(reason_start = :reason) AS selections, SUM(ms_played < :real_ms) AS skips, "
+                "MIN(day) AS first_day, MAX(day) AS last_day "
+                f"FROM plays {where} GROUP BY song_key ORDER BY song_key",
+                self.conn, params={'real_ms': params.real_ms, 'reason': self._reason_code(params.selection_reason),
+                                   'since': since_day})
+            songs = pd.read_sql_query("SELECT song_key, artist, track, uri FROM songs", self.conn)
+            self.stats_cache[(since_day, params)] = _finish_song_stats(stats, songs)
+        return self.stats_cache[(since_day, params)]
+
+    def songs_table(self):
+        return pd.read_sql_query("SELECT * FROM songs ORDER BY song_key", self.conn)
+
+    def song_names(self, song_keys):
+        song_keys = [int(key) for key in song_keys]
+        names = pd.read_sql_query(
+            f"SELECT * FROM songs WHERE song_key IN ({','.join('?' * len(song_keys))})", self.conn, params=song_keys)
+        return names.set_index('song_key').loc[song_keys].reset_index()
+
+    def find_song(self, artist, track):
+        row = self.conn.execute("SELECT song_key FROM songs WHERE artist = ? AND track = ?", (artist, track)).fetchone()
+        return row[0] if row else None
+
+    def _play_query(self, where, params):
+        return (
+            "SELECT p.song_key, p.day, p.ts, p.ms_played, r.reason AS reason_start "
+            f"FROM plays p LEFT JOIN reasons r ON r.code = p.reason_start WHERE {where} "
+            "ORDER BY p.song_key, p.day, p.ts", params)
+
+    def song_plays(self, song_key):
+        query, params = self._play_query("p.song_key = ?", (int(song_key),))
+        return _add_dates(pd.read_sql_query(query, self.conn, params=params))
+
+    def iter_play_batches(self, since=None, group_of=None):
+        """Yield plays ordered by (song_key, day) in cursor-sized batches that never split a song (or group_of group)"""
+        if since is None:
+            query, params = self._play_query("1", ())
+        else:
+            query, params = self._play_query("p.day >= ?", (date_to_day(since),))
+        chunks = pd.read_sql_query(query, self.conn, params=params, chunksize=SQLITE_CHUNK_ROWS)
+        return _whole_song_chunks(chunks, group_of)
+
+def _save_columns(frame, directory):
+    """Write each column of a frame as a .npy file, categoricals as codes plus a category list"""
+    os.makedirs(directory)
+    categories = {}
+    for column in frame.columns:
+        values = frame[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories[column] = values.cat.categories.tolist()
+            values = values.cat.codes
+        np.save(os.path.join(directory, f"{column}.npy"), values.to_numpy())
+    with open(os.path.join(directory, 'columns.json'), 'w') as f:
+        json.dump({'columns': list(frame.columns), 'categories': categories}, f)
+
+def _map_columns(directory):
+    """Map column files written by _save_columns read-only into a frame, without copying"""
+    with open(os.path.join(directory, 'columns.json')) as f:
+        meta = json.load(f)
+    columns = {}
+    for column in meta['columns']:
+        # A plain ndarray view of the mapping, so pandas doesn't carry the memmap subclass around
+        values = np.load(os.path.join(directory, f"{column}.npy"), mmap_mode='r').view(np.ndarray)
+        if column in meta['categories']:
+            values = pd.Categorical.from_codes(values, meta['categories'][column])
+        columns[column] = values
+    return pd.DataFrame(columns, copy=False)
+
+def _default_export_signature():
+    """Size and modification time of the bundled export, or None when it is missing"""
+    try:
+        stat = os.stat(DEFAULT_EXPORT)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+class MappedHistory(InMemoryHistory):
+    """Prepared listening history mapped read-only from column files under DATASET_DIR
+
+    Every app process on the machine maps the same files, so the OS page cache
+    holds one copy of the plays. Only the bundled export is ever published as
+    CURRENT, the dataset new sessions start from; publishing again swaps the
+    pointer and stores already open keep their mapping of the old version.
+    """
+
+    backend = 'Memory-mapped (shared)'
+
+    def __init__(self, path, version, shared=False):
+        with open(os.path.join(path, 'songs.json'), 'rb') as f:
+            songs = pd.DataFrame(json_loads(f.read()))
+        super().__init__(_map_columns(os.path.join(path, 'plays')), songs, version)
+        self.path = path
+        self.shared = shared
+        self._by_song = _map_columns(os.path.join(path, 'by_song'))
+
+    @classmethod
+    def build(cls, plays, songs, version):
+        """Write the dataset once per version and map it; this does not publish it"""
+        path = os.path.join(DATASET_DIR, version)
+        if not os.path.exists(path):
+            # Sessions are threads of one process, so each build writes its own temporary directory
+            os.makedirs(DATASET_DIR, exist_ok=True)
+            tmp_path = tempfile.mkdtemp(dir=DATASET_DIR, prefix=f"{version}.", suffix='.tmp')
+            try:
+                _save_columns(plays, os.path.join(tmp_path, 'plays'))
+                _save_columns(InMemoryHistory(plays, songs, version).by_song(), os.path.join(tmp_path, 'by_song'))
+                with open(os.path.join(tmp_path, 'songs.json'), 'w') as f:
+                    json.dump({column: songs[column].astype(object).where(songs[column].notna(), None).tolist()
+                               for column in songs.columns}, f)
+                os.replace(tmp_path, path)
+            except OSError:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                # Another build of the same version finished first
+                if not os.path.isdir(path):
+                    raise
+        return cls(path, version)
+
+    @classmethod
+    def publish_default(cls):
+        """Prepare the bundled export, write it and atomically point CURRENT at it"""
+        data, _ = load_default_data()
+        store = build_history_store(data)
+        if store is None:
+            return None
+        mapped = cls.build(*store.frames(), store.version)
+        fd, tmp_pointer = tempfile.mkstemp(dir=DATASET_DIR, prefix='CURRENT.', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': store.version, 'source': _default_export_signature()}, f)
+        os.replace(tmp_pointer, os.path.join(DATASET_DIR, 'CURRENT'))
+        mapped.shared = True
+        return mapped
+
+    @staticmethod
+    def current_version():
+        """Version CURRENT points at, or None unless it is the published bundled export as it is on disk now"""
+        try:
+            with open(os.path.join(DATASET_DIR, 'CURRENT')) as f:
+                pointer = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(pointer, dict) or pointer.get('source') != _default_export_signature():
+            return None
+        version = str(pointer.get('version'))
+        return version if os.path.isdir(os.path.join(DATASET_DIR, version)) else None
+
+    @classmethod
+    def open_current(cls):
+        """Map the published default dataset, or None when there is none"""
+        version = cls.current_version()
+        return cls(os.path.join(DATASET_DIR, version), version, shared=True) if version else None
+
+    def footprint(self):
+        """Bytes of the mapped column files (shared between processes) and of this process's song dictionary"""
+        mapped = sum(os.path.getsize(os.path.join(root, name))
+                     for root, _, names in os.walk(self.path) for name in names if name.endswith('.npy'))
+        return {'mapped column files (shared)': mapped,
+                'song dictionary': int(self.songs.memory_usage(index=False, deep=True).sum())}
+
+def footprint_report(raw_bytes, store):
+    """Bytes per play of the raw export frame (raw_bytes) against the prepared store, per component"""
+    sizes = {'raw export frame': int(raw_bytes)}
+    sizes.update({f"{store.backend}: {part}": int(size) for part, size in store.footprint().items()})
+    stored = sum(size for part, size in sizes.items() if part != 'raw export frame')
+    sizes[f"{store.backend}: total"] = stored
+    report = pd.DataFrame({'Component': list(sizes), 'Bytes': list(sizes.values())})
+    report['MB'] = (report['Bytes'] / 1e6).round(2)
+    report['Bytes per Play'] = (report['Bytes'] / max(len(store), 1)).round(1)
+    return report
+
+def synthetic_export(data, copies):
+    """Raw export frame repeated `copies` times, standing in for a history that many times longer
+
+    Each copy is shifted by a few seconds and renames its tracks, so the song
+    dictionary grows with the plays instead of being shared by every copy.
+    """
+    ts = pd.to_datetime(data['ts'], utc=True)
+    frames = [data]
+    for copy in range(2, copies + 1):
+        frames.append(data.assign(
+            ts=(ts + pd.Timedelta(seconds=copy)).dt.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            master_metadata_track_name=data['master_metadata_track_name'] + f" ({copy})",
+            spotify_track_uri=data['spotify_track_uri'] + f"-{copy}"))
+    return pd.concat(frames, ignore_index=True).sort_values('ts', kind='stable').reset_index(drop=True)
+
+def footprint_benchmark(data, copies=FOOTPRINT_COPIES):
+    """Bytes per play of the raw export frame against the in-memory store, for synthetic exports of each size"""
+    rows = []
+    for n in copies:
+        raw = synthetic_export(data, n)
+        store = build_history_store(raw)
+        report = footprint_report(raw.memory_usage(index=False, deep=True).sum(), store)
+        rows.append({
+            'Export': 'bundled' if n == 1 else f"synthetic {n}x",
+            'Plays': len(store),
+            'Raw Bytes per Play': report['Bytes per Play'].iat[0],
+            'Compact Bytes per Play': report['Bytes per Play'].iat[-1],
+        })
+        del raw, store
+    report = pd.DataFrame(rows)
+    report['Reduction'] = (report['Raw Bytes per Play'] / report['Compact Bytes per Play']).round(1)
+    return report
+
+def build_history_store(data, backend='In-memory'):
+    """Prepare raw export records and wrap them in the requested storage backend"""
+    if data is None:
+        return None
+    plays, songs, version = prepare_history(data)
+    if len(plays) == 0:
+        return None
+    return convert_history_store(InMemoryHistory(plays, songs, version), backend)
+
+def convert_history_store(store, backend):
+    """Move a prepared history to another storage backend"""
+    if store is None or store.backend == backend:
+        return store
+    plays, songs = store.frames()
+    if backend == SQLiteHistory.backend:
+        return SQLiteHistory.build(plays, songs, store.version)
+    if backend == MappedHistory.backend:
+        return MappedHistory.build(plays, songs, store.version)
+    return InMemoryHistory(plays, songs, store.version)
+
 # Initialize session state
 if 'data' not in st.session_state:
     st.session_state.data = None
@@ -281,11 +1779,26 @@ if 'playlist_view_states' not in st.session_state:
     st.session_state.playlist_view_states = {}
 if 'filtered_playlists' not in st.session_state:
     st.session_state.filtered_playlists = set()
+if 'ingest_timings' not in st.session_state:
+    st.session_state.ingest_timings = []
+if 'fixation_params' not in st.session_state:
+    st.session_state.fixation_params = DEFAULT_FIXATION
+if 'storage_backend' not in st.session_state:
+    st.session_state.storage_backend = MappedHistory.backend if MappedHistory.current_version() else InMemoryHistory.backend
+if 'footprint' not in st.session_state:
+    st.session_state.footprint = None
 
 # Load default data on first run
 if not st.session_state.default_data_loaded:
     with st.spinner("Loading default data..."):
-        st.session_state.data = load_default_data()
+        # Map the published shared dataset when there is one instead of parsing the export again
+        if st.session_state.storage_backend == MappedHistory.backend:
+            st.session_state.data = MappedHistory.open_current()
+        if st.session_state.data is None:
+            data, st.session_state.ingest_timings = load_default_data()
+            st.session_state.data = build_history_store(data, st.session_state.storage_backend)
+            if st.session_state.data is not None:
+                st.session_state.footprint = footprint_report(data.memory_usage(index=False, deep=True).sum(), st.session_state.data)
         st.session_state.playlists = load_default_playlists()
         st.session_state.default_data_loaded = True
 
@@ -337,96 +1850,33 @@ if st.session_state.current_page == 'Dashboard':
     # Overview metrics if data is loaded
     if st.session_state.data is not None:
         st.divider()
-        df = st.session_state.data.copy()
-        df = df[df['master_metadata_track_name'].notna()].copy()
-        df['date'] = pd.to_datetime(df['ts']).dt.date
+        store = st.session_state.data
         
         st.markdown("## Overview")
-        
-        # Metrics cards
-        col1, col2, col3, col4 = st.columns(4)
-        real_plays_count = (df['ms_played'] >= 25000).sum()
-        col1.metric("Real Plays", f"{real_plays_count:,}")
-        col2.metric("Unique Tracks", f"{df['master_metadata_track_name'].nunique():,}")
-        col3.metric("Unique Artists", f"{df['master_metadata_album_artist_name'].nunique():,}")
-        col4.metric("Hours", f"{df['ms_played'].sum() / (1000*60*60):,.0f}")
-        
-        # Top 10 Artists and Songs based on real plays
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("### Top 10 Artists")
-            # Filter to real plays only, then count by artist
-            real_plays_df = df[df['ms_played'] >= 25000]
-            top_artists = real_plays_df['master_metadata_album_artist_name'].value_counts().head(10).reset_index()
-            top_artists.columns = ['Artist', 'Real Plays']
-            st.dataframe(top_artists, width='stretch', hide_index=True)
-        
-        with col2:
-            st.markdown("### Top 10 Songs")
-            # Filter to real plays only, then count by song
-            top_songs = real_plays_df.groupby(['master_metadata_album_artist_name', 'master_metadata_track_name']).size().reset_index(name='Real Plays')
-            top_songs = top_songs.sort_values('Real Plays', ascending=False).head(10)
-            top_songs.columns = ['Artist', 'Track', 'Real Plays']
-            st.dataframe(top_songs[['Track', 'Artist', 'Real Plays']], width='stretch', hide_index=True)
-        
-        # Monthly listening graph
-        st.markdown("### Monthly Listening Activity")
-        df_copy = df.copy()
-        df_copy['month'] = pd.to_datetime(df_copy['ts'], utc=True).dt.to_period('M')
-        monthly_data = df_copy.groupby('month').size().reset_index(name='plays')
-        monthly_data['month'] = monthly_data['month'].astype(str)
-        
-        fig = px.bar(monthly_data, x='month', y='plays', title='Monthly Listening Activity')
-        fig.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font_color='white'
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        render_overview(store.overview(), top_artist_rollup(store, 10), store.top_songs(10), monthly_chart(store))
 
 elif st.session_state.current_page == 'Listening History':
     if st.session_state.data is None:
         st.warning("No data loaded. Please go to 'Import Data' to upload your Spotify data.")
     else:
-        df = st.session_state.data.copy()
-        df = df[df['master_metadata_track_name'].notna()].copy()
-        df['date'] = pd.to_datetime(df['ts']).dt.date
+        store = st.session_state.data
         
         st.header("Listening History")
+        params = fixation_settings(store)
         
         # Tab controls
-        tabs = st.tabs(["All Time", "Recent (30 days)", "Last Year"])
+        tabs = st.tabs(["All Time", "Recent (30 days)", "Last Year", "As Of Date", "Artists", "Sessions"])
         
         with tabs[0]:
             st.subheader("All Time (Songs with at least 3 plays)")
             
             # Calculate all time stats
-            all_songs = df.groupby(['master_metadata_album_artist_name', 'master_metadata_track_name']).agg(
-                total_plays=('ms_played', 'count'),
-                real_plays=('ms_played', lambda x: (x >= 25000).sum()),
-                selections=('reason_start', lambda x: (x == 'clickrow').sum()),
-                skips=('ms_played', lambda x: (x < 25000).sum()),
-                first_played=('date', 'min'),
-                last_played=('date', 'max')
-            ).reset_index()
-            
-            all_songs = all_songs[all_songs['total_plays'] >= 3]
-            
-            # Calculate peak fixations using proper rolling windows
-            progress_bar = st.progress(0)
-            peak_fixations = []
-            
-            for idx, row in all_songs.iterrows():
-                song_data = df[(df['master_metadata_album_artist_name'] == row['master_metadata_album_artist_name']) & 
-                              (df['master_metadata_track_name'] == row['master_metadata_track_name'])]
-                peak_fix, peak_date, window_stats = calculate_peak_fixation(song_data)
-                peak_fixations.append({'peak_fixation': peak_fix, 'peak_date': peak_date})
-                progress_bar.progress(min(1.0, (idx + 1) / len(all_songs)))
+            all_songs = store.song_stats(params=params)
+            all_songs = all_songs[all_songs['total_plays'] >= 3].reset_index(drop=True)
             
-            peak_df = pd.DataFrame(peak_fixations)
-            all_songs = pd.concat([all_songs, peak_df], axis=1)
-            all_songs['song_id'] = all_songs['master_metadata_album_artist_name'] + " - " + all_songs['master_metadata_track_name']
+            # Peak fixations using proper rolling windows
+            peak_df = peak_fixations(store, params)[['song_key', 'peak_fixation', 'peak_date']]
+            all_songs = all_songs.merge(peak_df, on='song_key', how='left')
             
             # Separate filtered and unfiltered
             unfiltered = all_songs[~all_songs['song_id'].isin(st.session_state.filtered_songs)]
@@ -479,16 +1929,7 @@ elif st.session_state.current_page == 'Listening History':
             
             # Export button
             st.divider()
-            if st.button("Export Song List", use_container_width=True):
-                unfiltered_songs = display_df[~display_df['song_id'].isin(st.session_state.filtered_songs)]
-                text_data = "\n".join([f"{row['master_metadata_track_name']} - {row['master_metadata_album_artist_name']}" 
-                                       for _, row in unfiltered_songs.iterrows()])
-                st.download_button(
-                    label="Download Playlist",
-                    data=text_data,
-                    file_name="spotify_playlist.txt",
-                    mime="text/plain"
-                )
+            song_list_export(display_df, "all_time_export")
             
             st.markdown("""
             **How to Create Your Playlist in Spotify**
@@ -503,50 +1944,26 @@ elif st.session_state.current_page == 'Listening History':
             st.subheader("Recent (30 days)")
             
             # Get recent data
-            max_date = df['date'].max()
+            max_date = day_to_date(store.day_range()[1])
             cutoff_date = max_date - timedelta(days=30)
-            recent_df = df[df['date'] >= cutoff_date]
+            recent_songs = store.song_stats(since=cutoff_date, params=params)
             
-            if len(recent_df) == 0:
+            if len(recent_songs) == 0:
                 st.warning("No plays in the last 30 days")
             else:
-                # Calculate recent stats
-                recent_songs = recent_df.groupby(['master_metadata_album_artist_name', 'master_metadata_track_name']).agg(
-                    total_plays=('ms_played', 'count'),
-                    real_plays=('ms_played', lambda x: (x >= 25000).sum()),
-                    selections=('reason_start', lambda x: (x == 'clickrow').sum()),
-                    skips=('ms_played', lambda x: (x < 25000).sum()),
-                    first_played=('date', 'min'),
-                    last_played=('date', 'max')
-                ).reset_index()
-                
                 # Calculate current fixation rating (for recent period)
-                recent_songs['current_fixation'] = (
+                # assign keeps the cached song_stats frame untouched
+                recent_songs = recent_songs.assign(current_fixation=(
                     recent_songs['real_plays'].astype(float) + 
                     (recent_songs['selections'].astype(float) / recent_songs['total_plays'].astype(float).clip(lower=1))
-                ).round(4)
-                
-                # Calculate all-time peak fixation for comparison
-                progress_bar = st.progress(0)
-                peak_fixations = []
-                
-                for idx, row in recent_songs.iterrows():
-                    song_data = df[(df['master_metadata_album_artist_name'] == row['master_metadata_album_artist_name']) & 
-                                  (df['master_metadata_track_name'] == row['master_metadata_track_name'])]
-                    peak_fix, peak_date, window_stats = calculate_peak_fixation(song_data)
-                    all_time_first = song_data['date'].min()
-                    all_time_last = song_data['date'].max()
-                    peak_fixations.append({
-                        'all_time_peak_fixation': peak_fix, 
-                        'all_time_peak_date': peak_date,
-                        'all_time_first': all_time_first,
-                        'all_time_last': all_time_last
-                    })
-                    progress_bar.progress(min(1.0, (idx + 1) / len(recent_songs)))
+                ).round(4))
                 
-                peak_df = pd.DataFrame(peak_fixations)
-                recent_songs = pd.concat([recent_songs, peak_df], axis=1)
-                recent_songs['song_id'] = recent_songs['master_metadata_album_artist_name'] + " - " + recent_songs['master_metadata_track_name']
+                # All-time peak fixation and play range for comparison
+                peak_df = peak_fixations(store, params)[['song_key', 'peak_fixation', 'peak_date']]
+                peak_df.columns = ['song_key', 'all_time_peak_fixation', 'all_time_peak_date']
+                all_time = store.song_stats(params=params)[['song_key', 'first_played', 'last_played']]
+                all_time.columns = ['song_key', 'all_time_first', 'all_time_last']
+                recent_songs = recent_songs.merge(peak_df, on='song_key', how='left').merge(all_time, on='song_key', how='left')
                 
                 recent_songs = recent_songs.sort_values('current_fixation', ascending=False)
                 
@@ -567,62 +1984,33 @@ elif st.session_state.current_page == 'Listening History':
                             st.session_state.filtered_songs.add(row['song_id'])
                         else:
                             st.session_state.filtered_songs.discard(row['song_id'])
+                
+                st.divider()
+                song_list_export(display_df, "recent_export", "spotify_recent")
         
         with tabs[2]:
             st.subheader("Last Year (365 days)")
             
             # Get last year data
-            max_date = df['date'].max()
+            max_date = day_to_date(store.day_range()[1])
             cutoff_date = max_date - timedelta(days=365)
-            year_df = df[df['date'] >= cutoff_date]
+            year_songs = store.song_stats(since=cutoff_date, params=params)
             
-            if len(year_df) == 0:
+            if len(year_songs) == 0:
                 st.warning("No plays in the last year")
             else:
-                # Calculate year stats
-                year_songs = year_df.groupby(['master_metadata_album_artist_name', 'master_metadata_track_name']).agg(
-                    total_plays=('ms_played', 'count'),
-                    real_plays=('ms_played', lambda x: (x >= 25000).sum()),
-                    selections=('reason_start', lambda x: (x == 'clickrow').sum()),
-                    skips=('ms_played', lambda x: (x < 25000).sum()),
-                    first_played=('date', 'min'),
-                    last_played=('date', 'max')
-                ).reset_index()
-                
-                # Calculate year fixation and all-time peak
-                progress_bar = st.progress(0)
-                fixation_data = []
-                
-                for idx, row in year_songs.iterrows():
-                    song_data = df[(df['master_metadata_album_artist_name'] == row['master_metadata_album_artist_name']) & 
-                                  (df['master_metadata_track_name'] == row['master_metadata_track_name'])]
-                    
-                    # Year fixation (max in last 365 days)
-                    year_song_data = song_data[song_data['date'] >= cutoff_date]
-                    year_fixation = 0
-                    if len(year_song_data) > 0:
-                        for end_date in year_song_data['date'].unique():
-                            start_date = max(end_date - timedelta(days=30), cutoff_date)
-                            fixation = calculate_fixation_for_period(song_data, start_date, end_date)
-                            year_fixation = max(year_fixation, fixation)
-                    
-                    # All-time peak
-                    peak_fix, peak_date, window_stats = calculate_peak_fixation(song_data)
-                    all_time_first = song_data['date'].min()
-                    all_time_last = song_data['date'].max()
-                    
-                    fixation_data.append({
-                        'year_fixation': year_fixation,
-                        'all_time_peak_fixation': peak_fix,
-                        'peak_date': peak_date,
-                        'all_time_first': all_time_first,
-                        'all_time_last': all_time_last
-                    })
-                    progress_bar.progress(min(1.0, (idx + 1) / len(year_songs)))
+                # Year fixation: peak over windows clipped to the last 365 days
+                year_df = peak_fixations(store, params, since=cutoff_date)[['song_key', 'peak_fixation']]
+                year_df.columns = ['song_key', 'year_fixation']
                 
-                fixation_df = pd.DataFrame(fixation_data)
-                year_songs = pd.concat([year_songs, fixation_df], axis=1)
-                year_songs['song_id'] = year_songs['master_metadata_album_artist_name'] + " - " + year_songs['master_metadata_track_name']
+                # All-time peak and play range
+                peak_df = peak_fixations(store, params)[['song_key', 'peak_fixation', 'peak_date']]
+                peak_df.columns = ['song_key', 'all_time_peak_fixation', 'peak_date']
+                all_time = store.song_stats(params=params)[['song_key', 'first_played', 'last_played']]
+                all_time.columns = ['song_key', 'all_time_first', 'all_time_last']
+                year_songs = (year_songs.merge(year_df, on='song_key', how='left')
+                              .merge(peak_df, on='song_key', how='left')
+                              .merge(all_time, on='song_key', how='left'))
                 
                 year_songs = year_songs.sort_values('year_fixation', ascending=False)
                 
@@ -643,6 +2031,134 @@ elif st.session_state.current_page == 'Listening History':
                             st.session_state.filtered_songs.add(row['song_id'])
                         else:
                             st.session_state.filtered_songs.discard(row['song_id'])
+                
+                st.divider()
+                song_list_export(display_df, "year_export", "spotify_last_year")
+        
+        with tabs[3]:
+            st.subheader("Fixation Leaderboard As Of Date")
+            
+            first_day, last_day = store.day_range()
+            first_date, last_date = day_to_date(first_day), day_to_date(last_day)
+            
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                mode = st.radio("Leaderboard for", ["Single date", "Date range"], key="as_of_mode")
+            with col2:
+                if mode == "Single date":
+                    start_date = end_date = st.date_input("Date", value=last_date, min_value=first_date, max_value=last_date, key="as_of_date")
+                else:
+                    date_range = st.date_input("Date range", value=(max(first_date, last_date - timedelta(days=365)), last_date),
+                                               min_value=first_date, max_value=last_date, key="as_of_range")
+                    start_date, end_date = date_range if len(date_range) == 2 else (date_range[0], date_range[0])
+            with col3:
+                top_n = st.selectbox("Top", [10, 25, 50, 100], key="as_of_top_n")
+            
+            # Scans only the requested day rows of the precomputed timeline
+            timeline = fixation_timeline(store, params)
+            leaders = timeline.top_over(date_to_day(start_date), date_to_day(end_date), top_n + len(st.session_state.filtered_songs))
+            
+            if len(leaders) == 0:
+                st.info("No song reached a qualifying fixation window in this period")
+            else:
+                names = store.song_names(leaders['song_key'])
+                leaders['Track'] = names['track'].to_numpy()
+                leaders['Artist'] = names['artist'].to_numpy()
+                song_ids = leaders['Artist'] + " - " + leaders['Track']
+                leaders = leaders[~song_ids.isin(st.session_state.filtered_songs)].head(top_n)
+                leaders = leaders.rename(columns={'fixation': 'Fixation', 'date': 'Reached On'})
+                columns = ['Track', 'Artist', 'Fixation'] + (['Reached On'] if mode == "Date range" else [])
+                st.dataframe(leaders[columns].round({'Fixation': 2}), width='stretch', hide_index=True)
+            st.caption(f"Rolling {params.window_days}-day fixation ending on each day")
+        
+        with tabs[4]:
+            st.subheader("Artists")
+            
+            # Artist, album and track figures all come from the same cached rollup
+            rollups = hierarchy_rollups(store, params)
+            stat_columns = {'real_plays': 'Real Plays', 'selections': 'Selections', 'skips': 'Skips', 'total_plays': 'Total',
+                            'peak_fixation': 'Peak Fixation', 'peak_date': 'Peak Date', 'first_played': 'First', 'last_played': 'Last'}
+            
+            col1, col2 = st.columns([1, 1])
+            with col1:
+                sort_by = st.selectbox("Sort artists by", ["Peak Fixation", "Real Plays"], key="artist_sort")
+            with col2:
+                artists_shown = st.selectbox("Artists shown", [25, 50, 100, 500], index=2, key="artist_count")
+            
+            artists = rollups['artist'].sort_values('peak_fixation' if sort_by == "Peak Fixation" else 'real_plays',
+                                                   ascending=False, kind='stable').head(artists_shown)
+            artist_table = artists[['artist', 'albums', 'tracks'] + list(stat_columns)].rename(
+                columns={'artist': 'Artist', 'albums': 'Albums', 'tracks': 'Tracks', **stat_columns})
+            st.dataframe(artist_table.round({'Peak Fixation': 2}), width='stretch', hide_index=True)
+            
+            selected_artist = st.selectbox("Artist details", artists['artist'].tolist(), key="artist_detail")
+            if selected_artist is not None:
+                artist_key = artists.index[artists['artist'] == selected_artist][0]
+                
+                st.markdown(f"#### Albums by {selected_artist}")
+                albums = rollups['album'][rollups['album']['artist_key'] == artist_key].sort_values('peak_fixation', ascending=False)
+                album_table = albums[['album', 'tracks'] + list(stat_columns)].rename(
+                    columns={'album': 'Album', 'tracks': 'Tracks', **stat_columns})
+                st.dataframe(album_table.round({'Peak Fixation': 2}), width='stretch', hide_index=True)
+                
+                st.markdown(f"#### Tracks by {selected_artist}")
+                tracks = rollups['track'][rollups['track']['artist_key'] == artist_key].sort_values('peak_fixation', ascending=False)
+                track_table = tracks[['track', 'album'] + list(stat_columns)].rename(
+                    columns={'track': 'Track', 'album': 'Album', **stat_columns})
+                st.dataframe(track_table.round({'Peak Fixation': 2}), width='stretch', hide_index=True)
+        
+        with tabs[5]:
+            st.subheader("Listening Sessions")
+            
+            gap_minutes = st.select_slider("Session break after idle minutes", [5, 10, 15, 30, 45, 60, 90, 120],
+                                           value=SESSION_GAP_MINUTES, key="session_gap")
+            analytics = session_analytics(store, gap_minutes, params.real_ms)
+            sessions = analytics['sessions']
+            
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Sessions", f"{len(sessions):,}")
+            col2.metric("Median Plays / Session", f"{sessions['plays'].median():,.0f}")
+            col3.metric("Median Minutes / Session", f"{sessions['minutes'].median():,.0f}")
+            col4.metric("Session Skip Rate", f"{sessions['skips'].sum() / max(sessions['plays'].sum(), 1):.0%}")
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("### Skip Rate by Position in Session")
+                st.dataframe(analytics['positions'].round({'Skip Rate': 3, 'Completion Rate': 3}), width='stretch', hide_index=True)
+            with col2:
+                st.markdown("### Longest Binge Runs")
+                runs = analytics['runs'].head(10)
+                names = store.song_names(runs['song_key'])
+                st.dataframe(pd.DataFrame({
+                    'Track': names['track'].to_numpy(),
+                    'Artist': names['artist'].to_numpy(),
+                    'Plays in a Row': runs['plays'].to_numpy(),
+                    'Date': runs['start'].dt.date.to_numpy(),
+                }), width='stretch', hide_index=True)
+            
+            st.markdown("### Songs in Sessions")
+            col1, col2 = st.columns(2)
+            with col1:
+                rank_by = st.selectbox("Rank songs by", ["Session starts", "Session ends", "Completion rate", "Early skip rate"], key="session_rank")
+            with col2:
+                min_plays = st.number_input("Minimum plays", min_value=1, value=5, key="session_min_plays")
+            rank_column = {'Session starts': 'session_starts', 'Session ends': 'session_ends',
+                           'Completion rate': 'completion_rate', 'Early skip rate': 'early_skip_rate'}[rank_by]
+            session_songs = analytics['songs'][analytics['songs']['plays'] >= min_plays]
+            session_songs = session_songs.sort_values(rank_column, ascending=False, kind='stable').head(100)
+            names = store.song_names(session_songs['song_key'])
+            session_table = pd.DataFrame({
+                'Track': names['track'].to_numpy(),
+                'Artist': names['artist'].to_numpy(),
+                'Plays': session_songs['plays'].to_numpy(),
+                'Session Starts': session_songs['session_starts'].to_numpy(),
+                'Session Ends': session_songs['session_ends'].to_numpy(),
+                'Completion Rate': session_songs['completion_rate'].round(3).to_numpy(),
+                f'Skip Rate (first {SESSION_EARLY_POSITIONS})': session_songs['early_skip_rate'].round(3).to_numpy(),
+                'Skip Rate (later)': session_songs['late_skip_rate'].round(3).to_numpy(),
+                'Mean Position': session_songs['mean_position'].round(1).to_numpy(),
+            })
+            st.dataframe(session_table, width='stretch', hide_index=True)
 
 elif st.session_state.current_page == 'Playlists':
     if st.session_state.playlists is None:
@@ -727,9 +2243,8 @@ elif st.session_state.current_page == 'Data Visualization':
     st.header("Data Visualization")
     
     if st.session_state.data is not None:
-        df = st.session_state.data.copy()
-        df = df[df['master_metadata_track_name'].notna()].copy()
-        df['date'] = pd.to_datetime(df['ts']).dt.date
+        store = st.session_state.data
+        params = fixation_settings(store)
         
         # Dropdown menu for song list selection
         st.subheader("Choose Song List")
@@ -743,13 +2258,8 @@ elif st.session_state.current_page == 'Data Visualization':
         
         if selected_list == "Top 100 All Time Songs":
             # Get top songs by real plays
-            song_stats = df.groupby(['master_metadata_album_artist_name', 'master_metadata_track_name']).agg(
-                real_plays=('ms_played', lambda x: (x >= 25000).sum()),
-                first_played=('date', 'min')
-            ).reset_index()
-            
+            song_stats = store.song_stats(params=params)
             song_stats = song_stats[song_stats['real_plays'] > 0]
-            song_stats['song_id'] = song_stats['master_metadata_album_artist_name'] + " - " + song_stats['master_metadata_track_name']
             unfiltered_songs = song_stats[~song_stats['song_id'].isin(st.session_state.filtered_songs)]
             top_songs = unfiltered_songs.sort_values('real_plays', ascending=False).head(100)
             
@@ -757,28 +2267,8 @@ elif st.session_state.current_page == 'Data Visualization':
             
         elif selected_list == "Top 100 Fixations":
             # Calculate peak fixations using proper rolling windows
-            all_songs = df.groupby(['master_metadata_album_artist_name', 'master_metadata_track_name']).agg(
-                first_played=('date', 'min')
-            ).reset_index()
-            
-            progress_bar = st.progress(0)
-            fixation_results = []
-            
-            for idx, row in all_songs.iterrows():
-                song_data = df[(df['master_metadata_album_artist_name'] == row['master_metadata_album_artist_name']) & 
-                              (df['master_metadata_track_name'] == row['master_metadata_track_name'])]
-                peak_fix, peak_date, window_stats = calculate_peak_fixation(song_data)
-                
-                fixation_results.append({
-                    'master_metadata_album_artist_name': row['master_metadata_album_artist_name'],
-                    'master_metadata_track_name': row['master_metadata_track_name'],
-                    'peak_fixation': peak_fix,
-                    'first_played': row['first_played']
-                })
-                progress_bar.progress(min(1.0, (idx + 1) / len(all_songs)))
-            
-            fixation_df = pd.DataFrame(fixation_results)
-            fixation_df['song_id'] = fixation_df['master_metadata_album_artist_name'] + " - " + fixation_df['master_metadata_track_name']
+            all_songs = store.song_stats(params=params)
+            fixation_df = all_songs.merge(peak_fixations(store, params)[['song_key', 'peak_fixation']], on='song_key')
             unfiltered_fixations = fixation_df[~fixation_df['song_id'].isin(st.session_state.filtered_songs)]
             top_fixations = unfiltered_fixations.sort_values('peak_fixation', ascending=False).head(100)
             
@@ -800,6 +2290,7 @@ elif st.session_state.current_page == 'Data Visualization':
                     if track:
                         artist = track.get('artistName', 'Unknown')
                         track_name = track.get('trackName', 'Unknown')
+                        track_uri = track.get('trackUri')
                         date_added = item.get('addedDate', '')
                         
                         try:
@@ -810,7 +2301,8 @@ elif st.session_state.current_page == 'Data Visualization':
                         playlist_songs.append({
                             'master_metadata_album_artist_name': artist,
                             'master_metadata_track_name': track_name,
-                            'first_played': first_played
+                            'first_played': first_played,
+                            'spotify_track_uri': track_uri
                         })
                 
                 display_songs = pd.DataFrame(playlist_songs).sort_values('first_played')
@@ -823,6 +2315,7 @@ elif st.session_state.current_page == 'Data Visualization':
             with col1:
                 st.subheader("Song List")
                 st.write(f"Showing {len(display_songs)} songs (sorted by first play date)")
+                song_list_export(display_songs, "viz_export", "spotify_song_list")
                 
                 for idx, row in display_songs.iterrows():
                     if st.button(f"{row['master_metadata_track_name']} - {row['master_metadata_album_artist_name']}", key=f"song_{idx}"):
@@ -835,12 +2328,12 @@ elif st.session_state.current_page == 'Data Visualization':
                     selected = st.session_state.selected_song
                     
                     # Get song data
-                    song_data = df[(df['master_metadata_album_artist_name'] == selected['master_metadata_album_artist_name']) & 
-                                  (df['master_metadata_track_name'] == selected['master_metadata_track_name'])]
+                    song_key = store.find_song(selected['master_metadata_album_artist_name'], selected['master_metadata_track_name'])
+                    song_data = store.song_plays(song_key) if song_key is not None else pd.DataFrame()
                     
                     if len(song_data) > 0:
                         # Calculate monthly fixations
-                        song_data['month'] = pd.to_datetime(song_data['ts']).dt.to_period('M')
+                        song_data['month'] = pd.to_datetime(song_data['date']).dt.to_period('M')
                         
                         monthly_fixations = []
                         for month in song_data['month'].unique():
@@ -848,7 +2341,7 @@ elif st.session_state.current_page == 'Data Visualization':
                             month_start = month.start_time.date()
                             month_end = month.end_time.date()
                             
-                            fixation = calculate_fixation_for_period(song_data, month_start, month_end)
+                            fixation = calculate_fixation_for_period(song_data, month_start, month_end, params)
                             monthly_fixations.append({
                                 'Month': str(month),
                                 'Peak Fixation': fixation
@@ -858,6 +2351,24 @@ elif st.session_state.current_page == 'Data Visualization':
                         if len(monthly_df) > 0:
                             st.dataframe(monthly_df, width='stretch', hide_index=True)
                             
+                            # Songs most often really played alongside this one
+                            st.subheader("Related Fixations")
+                            together = st.radio("Played together within", ["Same day", "Same session"], horizontal=True, key="related_together")
+                            matrix = co_listening(store, 'session' if together == "Same session" else 'day', params.real_ms)
+                            related = matrix.related(song_key, 10)
+                            if len(related) > 0:
+                                names = store.song_names(related['song_key'])
+                                peaks = peak_fixations(store, params).set_index('song_key')['peak_fixation']
+                                st.dataframe(pd.DataFrame({
+                                    'Track': names['track'].values,
+                                    'Artist': names['artist'].values,
+                                    'Together': related['together'].values,
+                                    'Affinity': related['score'].round(2).values,
+                                    'Peak Fixation': peaks.reindex(related['song_key']).fillna(0).round(2).values,
+                                }), width='stretch', hide_index=True)
+                            else:
+                                st.write("No songs played together with this one yet")
+                            
                             # Detailed analysis charts
                             st.subheader(f"Detailed Analysis: {selected['master_metadata_track_name']}")
                             
@@ -875,12 +2386,7 @@ elif st.session_state.current_page == 'Data Visualization':
                             st.plotly_chart(fig_bar, use_container_width=True)
                             
                             # Scatter plot
-                            song_data['day'] = pd.to_datetime(song_data['ts']).dt.date
-                            daily_plays = song_data.groupby('day').size().reset_index(name='plays')
-                            
-                            fig_scatter = px.scatter(daily_plays, x='day', y='plays', title='Daily Play Scatter Plot')
-                            fig_scatter.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font_color='white')
-                            st.plotly_chart(fig_scatter, use_container_width=True)
+                            st.plotly_chart(play_scatter_chart(store, song_key, song_data), use_container_width=True)
                     else:
                         st.write("No data found for selected song")
                 else:
@@ -900,12 +2406,23 @@ elif st.session_state.current_page == 'Import Data':
         st.write("Upload your Spotify extended streaming history files (JSON or ZIP format)")
         uploaded_files = st.file_uploader("Upload Spotify JSON or ZIP", type=['json', 'zip'], accept_multiple_files=True, key="listening_history")
         
-        if st.button("Process Files") and uploaded_files:
-            with st.spinner("Processing files..."):
-                st.session_state.data = process_spotify_data(uploaded_files)
-                if st.session_state.data is not None:
-                    st.success(f"✅ Loaded {len(st.session_state.data):,} records")
-                    st.info("Navigate to 'Listening History' to view your data")
+        backends = [InMemoryHistory.backend, SQLiteHistory.backend, MappedHistory.backend]
+        st.session_state.storage_backend = st.radio(
+            "Storage backend", backends, index=backends.index(st.session_state.storage_backend), horizontal=True,
+            help="SQLite keeps the history on disk and runs aggregates as SQL, for histories too large to hold per session. "
+                 "Memory-mapped keeps it in read-only column files mapped from disk"
+        )
+        if st.session_state.data is not None and st.session_state.data.backend != st.session_state.storage_backend:
+            with st.spinner(f"Moving history to {st.session_state.storage_backend} storage..."):
+                st.session_state.data = convert_history_store(st.session_state.data, st.session_state.storage_backend)
+                if st.session_state.footprint is not None:
+                    st.session_state.footprint = footprint_report(st.session_state.footprint['Bytes'].iat[0], st.session_state.data)
+        
+        streaming_summary = st.checkbox(
+            "Streaming summary preview",
+            help="Show provisional Dashboard figures (sketch estimates) while large uploads are still being processed"
+        )
+        process_files = st.button("Process Files") and uploaded_files
     
     with col2:
         st.subheader("Playlists")
@@ -919,6 +2436,33 @@ elif st.session_state.current_page == 'Import Data':
                     st.success(f"✅ Loaded {len(st.session_state.playlists.get('playlists', []))} playlists")
                     st.info("Navigate to 'Playlists' to view your playlists")
     
+    if process_files:
+        summary = StreamingSummary() if streaming_summary else None
+        preview = st.empty()
+        
+        def show_provisional(frame):
+            summary.update(frame)
+            with preview.container():
+                st.markdown(f"## Provisional Overview ({summary.records:,} records so far)")
+                render_overview(summary.overview(), summary.top_artists(10), summary.top_songs(10),
+                                monthly_plays_figure(summary.monthly_plays()), summary.error_bounds(),
+                                chart_key=f"provisional_monthly_{summary.updates}")
+        
+        with st.spinner("Processing files..."):
+            data, st.session_state.ingest_timings = process_spotify_data(uploaded_files, show_provisional if summary else None)
+            st.session_state.data = build_history_store(data, st.session_state.storage_backend)
+        if st.session_state.data is not None:
+            store = st.session_state.data
+            st.session_state.footprint = footprint_report(data.memory_usage(index=False, deep=True).sum(), store)
+            if summary is not None:
+                # Swap the estimates for the exact figures
+                with preview.container():
+                    st.markdown("## Overview")
+                    render_overview(store.overview(), top_artist_rollup(store, 10), store.top_songs(10), monthly_chart(store),
+                                    chart_key="overview_monthly")
+            st.success(f"✅ Loaded {len(store):,} records")
+            st.info("Navigate to 'Listening History' to view your data")
+    
     st.divider()
     
     st.subheader("How to Get Your Spotify Data")
@@ -933,10 +2477,46 @@ elif st.session_state.current_page == 'Import Data':
     st.divider()
     st.subheader("Current Data Status")
     if st.session_state.data is not None:
-        st.success(f"✅ Listening history loaded: {len(st.session_state.data):,} records")
+        st.success(f"✅ Listening history loaded: {len(st.session_state.data):,} records ({st.session_state.data.backend})")
+        current_version = MappedHistory.current_version()
+        if getattr(st.session_state.data, 'shared', False) and current_version != st.session_state.data.version:
+            st.info("A newer shared dataset has been published; this session keeps its current one until reloaded")
+            if st.button("Reload shared dataset") and current_version:
+                st.session_state.data = MappedHistory.open_current()
+                st.session_state.footprint = None
+                st.rerun()
     else:
         st.info("ℹ️ No listening history loaded")
     
+    with st.expander("Shared default dataset"):
+        st.caption("New sessions on every app process start from the published bundled export, mapped read-only. "
+                   "Uploaded histories are never published.")
+        st.write(f"Published version: {MappedHistory.current_version() or 'none'}")
+        if st.button("Publish bundled export"):
+            with st.spinner("Publishing bundled export..."):
+                published = MappedHistory.publish_default()
+            if published is not None:
+                st.success(f"✅ Published version {published.version}")
+            else:
+                st.error("No bundled export to publish")
+    
+    if st.session_state.ingest_timings:
+        with st.expander(f"Ingest timings ({JSON_BACKEND} decoder, up to {INGEST_WORKERS} workers)"):
+            st.dataframe(pd.DataFrame(st.session_state.ingest_timings), width='stretch', hide_index=True)
+    
+    if st.session_state.data is not None and st.session_state.footprint is not None:
+        with st.expander("Memory footprint (bytes per play)"):
+            st.dataframe(st.session_state.footprint, width='stretch', hide_index=True)
+            st.caption("Per music play; the raw export frame also holds podcast and video records")
+    
+    if os.path.exists(DEFAULT_EXPORT):
+        with st.expander("Footprint benchmark (bundled export)"):
+            copies = ', '.join(f"{n}x" for n in FOOTPRINT_COPIES if n > 1)
+            st.write(f"Bytes per play before and after preparation, for the bundled export and synthetic {copies} copies of it")
+            if st.button("Run benchmark", help="The largest synthetic exports take a while and need memory for the raw frame"):
+                with st.spinner("Building synthetic exports..."):
+                    st.dataframe(footprint_benchmark(load_default_data()[0]), width='stretch', hide_index=True)
+    
     if st.session_state.playlists is not None:
         st.success(f"✅ Playlists loaded: {len(st.session_state.playlists.get('playlists', []))} playlists")
     else: